@@ -1,39 +1,88 @@
+import argparse
 import asyncio
+import json
+import os
 import aiohttp
 import time
 
+from download import Downloader
+from http_cache import HTTPCache
+from keyed_semaphore import KeyedSemaphore
 
-async def fetch_url(url, semaphore, session):
-    """Fetches data from a URL, respecting the semaphore limit."""
-    async with semaphore:
+
+async def fetch_url(url, semaphore, session, downloader=None, cache=None):
+    """Fetches data from a URL, respecting the per-host and global limits.
+
+    With a `downloader` the response body is streamed to disk as well. With a
+    `cache` duplicate URLs share one request and cached ones are revalidated;
+    a body the cache supplies is linked into the download directory.
+    """
+    if cache is None:
+        url, status, _ = await _fetch_url(url, semaphore, session, downloader)
+        return url, status
+
+    url, status, body = await cache.fetch(
+        url, lambda: _fetch_url(url, semaphore, session, downloader, cache)
+    )
+    name = asyncio.current_task().get_name()
+    if downloader is not None and body is not None and body != downloader.path(name):
+        report_download(downloader.link(body, name))
+    return url, status
+
+
+def report_download(download):
+    print(
+        f"[{asyncio.current_task().get_name()}] Saved {download.size} bytes "
+        f"to {download.path} (sha256 {download.digest[:12]}"
+        f"{', truncated' if download.truncated else ''})"
+    )
+
+
+async def _fetch_url(url, semaphore, session, downloader=None, cache=None):
+    """Returns `(url, status, body_path)`, the body file being None if not kept."""
+    async with semaphore.acquire(semaphore.key_for(url)) as slot:
         print(f"[{asyncio.current_task().get_name()}] Acquiring semaphore for {url}...")
 
         try:
             print(f"[{asyncio.current_task().get_name()}] Fetching {url}...")
 
-            async with session.get(url) as response:
+            headers = cache.validators(url) if cache is not None else None
+            async with session.get(url, headers=headers) as response:
                 await asyncio.sleep(0.1)
                 status = response.status
+                slot.error = status >= 500 or status == 429
+                body = None
+                if cache is not None:
+                    status, body = await cache.update(url, response)
+                # a body already streamed into the cache isn't downloaded twice
+                if downloader is not None and body is None:
+                    download = await downloader.save(
+                        response, asyncio.current_task().get_name()
+                    )
+                    report_download(download)
+                    body = download.path
                 print(
                     f"[{asyncio.current_task().get_name()}] Finished fetching {url} with status {status}"
                 )
-                return url, status
+                return url, status, body
         except aiohttp.ClientError as e:
             print(f"[{asyncio.current_task().get_name()}] Error fetching {url}: {e}")
-            return url, None
+            slot.error = True
+            return url, None, None
         finally:
             pass
 
 
-async def main(urls, max_concurrent_requests):
-    semaphore = asyncio.Semaphore(max_concurrent_requests)
-    print(f"Created semaphore with limit: {max_concurrent_requests}")
+async def main(urls, max_concurrent_requests, downloader=None, cache=None):
+    semaphore = KeyedSemaphore(max_concurrent_requests)
+    print(f"Created semaphore with global limit: {max_concurrent_requests}")
 
     async with aiohttp.ClientSession() as session:
         fetch_tasks = []
         for i, url in enumerate(urls):
             task = asyncio.create_task(
-                fetch_url(url, semaphore, session), name=f"Task-{i}"
+                fetch_url(url, semaphore, session, downloader, cache),
+                name=f"Task-{i}",
             )
             fetch_tasks.append(task)
 
@@ -43,8 +92,194 @@ async def main(urls, max_concurrent_requests):
         for url, status in results:
             print(f"URL: {url}, Status: {status}")
 
+        semaphore.report()
+
+
+def read_specs(path, start_line=0, start_byte=0):
+    """Lazily yield `(line_no, start_byte, end_byte, raw)` per request in a JSONL file.
+
+    Lines are not decoded here, see `parse_spec`; blank lines are skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(start_byte)
+        position = start_byte
+        for line_no, raw in enumerate(f, start_line):
+            start, position = position, position + len(raw)
+            if raw.strip():
+                yield line_no, start, position, raw
+
+
+def parse_spec(raw):
+    """Decode one JSONL line into a request spec, a JSON object with a `url`.
+
+    Raises ValueError for anything else.
+    """
+    spec = json.loads(raw)
+    if not isinstance(spec, dict) or not isinstance(spec.get("url"), str):
+        raise ValueError(f"expected an object with a url, got {raw[:80]!r}")
+    return spec
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        return checkpoint["line"], checkpoint["byte"]
+    return None
+
+
+def save_checkpoint(path, line, byte):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"line": line, "byte": byte}, f)
+    os.replace(tmp_path, path)
+
+
+async def fetch_jsonl(
+    input_path,
+    output_path,
+    max_concurrent_requests,
+    window,
+    offset=0,
+    checkpoint=None,
+    downloader=None,
+    cache=None,
+):
+    """Fetch every request in `input_path`, keeping at most `window` in flight.
+
+    Results are appended to `output_path` as they complete, so memory use does
+    not depend on the size of the input. A line that isn't a valid request, or
+    whose fetch raises, gets a record with `status` null and the `error`; the
+    other lines carry on. The
+    checkpoint records the first line that has not completed yet, the lowest
+    one still in flight; everything before it is done. Lines after it that
+    finished before a crash are fetched again on resume, so the output is
+    at-least-once.
+    """
+    resume = load_checkpoint(checkpoint)
+    if resume:
+        start_line, start_byte = resume
+        specs = read_specs(input_path, start_line, start_byte)
+    else:
+        start_line = offset
+        specs = (s for s in read_specs(input_path) if s[0] >= offset)
+    print(f"Streaming requests from {input_path} starting at line {start_line}")
+
+    semaphore = KeyedSemaphore(max_concurrent_requests)
+    # task -> (line_no, start_byte, url); at most `window` entries
+    pending = {}
+    next_unread = None  # (line_no, byte) just past the last line read
+    completed = 0
+
+    async with aiohttp.ClientSession() as session:
+        with open(output_path, "a" if resume else "w") as out:
+            specs_left = True
+            try:
+                while specs_left or pending:
+                    while specs_left and len(pending) < window:
+                        try:
+                            line_no, start_byte, end_byte, raw = next(specs)
+                        except StopIteration:
+                            specs_left = False
+                            break
+                        next_unread = (line_no + 1, end_byte)
+                        try:
+                            spec = parse_spec(raw)
+                        except ValueError as e:
+                            record = {"line": line_no, "url": None, "status": None}
+                            record["error"] = repr(e)
+                            out.write(json.dumps(record) + "\n")
+                            completed += 1
+                            continue
+                        task = asyncio.create_task(
+                            fetch_url(spec["url"], semaphore, session, downloader, cache),
+                            name=f"Task-{line_no}",
+                        )
+                        pending[task] = (line_no, start_byte, spec["url"])
+
+                    done = ()
+                    if pending:
+                        done, _ = await asyncio.wait(
+                            pending.keys(), return_when=asyncio.FIRST_COMPLETED
+                        )
+                    for task in done:
+                        line_no, _, url = pending.pop(task)
+                        record = {"line": line_no, "url": url, "status": None}
+                        if task.cancelled():
+                            record["error"] = "cancelled"
+                        elif task.exception() is not None:
+                            record["error"] = repr(task.exception())
+                        else:
+                            record["url"], record["status"] = task.result()
+                        out.write(json.dumps(record) + "\n")
+                        completed += 1
+
+                    if checkpoint and next_unread is not None:
+                        # everything before the lowest line in flight is done
+                        line, byte = min(
+                            ((line, byte) for line, byte, _ in pending.values()),
+                            default=next_unread,
+                        )
+                        out.flush()
+                        save_checkpoint(checkpoint, line, byte)
+            finally:
+                # an interrupted run doesn't leave its in-flight fetches behind
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.wait(pending.keys())
+
+    print(f"Fetched {completed} requests into {output_path}")
+    semaphore.report()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk URL fetcher")
+    parser.add_argument("--input", help="JSONL file of request specs to stream")
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument("--max-concurrent", type=int, default=3)
+    parser.add_argument(
+        "--window", type=int, default=100, help="maximum tasks in flight"
+    )
+    parser.add_argument(
+        "--offset", type=int, default=0, help="first input line to fetch"
+    )
+    parser.add_argument("--checkpoint", help="file to record progress in")
+    parser.add_argument("--download-dir", help="stream response bodies into this directory")
+    parser.add_argument(
+        "--max-size", type=int, help="stop downloading a body after this many bytes"
+    )
+    parser.add_argument(
+        "--cache-dir", help="keep validators and bodies here between runs"
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    downloader = (
+        Downloader(args.download_dir, args.max_size) if args.download_dir else None
+    )
+    cache = HTTPCache(args.cache_dir) if args.cache_dir else None
+    if args.input:
+        start_time = time.time()
+        asyncio.run(
+            fetch_jsonl(
+                args.input,
+                args.output,
+                args.max_concurrent,
+                args.window,
+                args.offset,
+                args.checkpoint,
+                downloader,
+                cache,
+            )
+        )
+        print(f"\nTotal execution time: {time.time() - start_time:.2f} seconds")
+        if cache is not None:
+            cache.report()
+        raise SystemExit
+
     example_urls = [
         "https://www.google.com/",
         "https://www.google.com/",
@@ -59,10 +294,12 @@ if __name__ == "__main__":
         "https://www.google.com/",
     ]
 
-    max_concurrent = 3
+    max_concurrent = args.max_concurrent
 
     print("Starting asynchronous fetching with semaphore...")
     start_time = time.time()
-    asyncio.run(main(example_urls, max_concurrent))
+    asyncio.run(main(example_urls, max_concurrent, downloader, cache))
     end_time = time.time()
     print(f"\nTotal execution time: {end_time - start_time:.2f} seconds")
+    if cache is not None:
+        cache.report()
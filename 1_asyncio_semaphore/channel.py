@@ -0,0 +1,188 @@
+"""
+A bounded channel for producer/consumer hand-off.
+
+Compared to the list + `asyncio.Condition` buffer in condition.py:
+  * items live in a fixed-size ring buffer, so taking one is O(1) instead of
+    the O(n) `list.pop(0)`
+  * producers and consumers wait in separate queues and each change wakes
+    exactly one waiter of the right kind, instead of `notify_all()` waking
+    every producer and consumer just for all but one to go back to sleep
+  * `close()` lets consumers drain what is left and then stop cleanly
+  * `put_many` / `get_many` move a whole batch per wakeup
+"""
+
+import asyncio
+from collections import deque
+
+
+_NOTHING = object()
+
+
+class ChannelClosed(Exception):
+    """Raised when putting into, or getting from an empty, closed channel."""
+
+
+class Channel:
+    """Bounded FIFO channel backed by a ring buffer.
+
+    Args:
+        capacity (int): maximum number of buffered items.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._closed = False
+        self._getters: deque[asyncio.Future] = deque()
+        self._putters: deque[asyncio.Future] = deque()
+        # number of times a waiting producer or consumer was resumed
+        self.wakeups = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def full(self) -> bool:
+        return self._size == self.capacity
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @staticmethod
+    def _wake_one(waiters: deque) -> None:
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def _wait(self, waiters: deque) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+            self.wakeups += 1
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # we were woken but won't act on it, hand the wakeup on
+                self._wake_one(waiters)
+            elif waiter in waiters:
+                # _wake_one() may already have dropped it as done
+                waiters.remove(waiter)
+            raise
+
+    def _push(self, item) -> None:
+        self._buffer[(self._head + self._size) % self.capacity] = item
+        self._size += 1
+
+    def _pop(self):
+        item = self._buffer[self._head]
+        self._buffer[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        return item
+
+    def put_nowait(self, item) -> None:
+        if self._closed:
+            raise ChannelClosed
+        if self._size == self.capacity:
+            raise asyncio.QueueFull
+        self._push(item)
+        self._wake_one(self._getters)
+        if self._size < self.capacity:
+            # space left over, let the next producer in line have it
+            self._wake_one(self._putters)
+
+    def get_nowait(self):
+        if self._size == 0:
+            if self._closed:
+                raise ChannelClosed
+            raise asyncio.QueueEmpty
+        item = self._pop()
+        self._wake_one(self._putters)
+        if self._size:
+            # items left over, let the next consumer in line have them
+            self._wake_one(self._getters)
+        return item
+
+    async def put(self, item) -> None:
+        """Put `item`, waiting while the channel is full."""
+        while self._size == self.capacity and not self._closed:
+            await self._wait(self._putters)
+        self.put_nowait(item)
+
+    async def get(self):
+        """Take the oldest item, waiting while the channel is empty.
+
+        Raises:
+            ChannelClosed: the channel is closed and has been drained.
+        """
+        while self._size == 0 and not self._closed:
+            await self._wait(self._getters)
+        return self.get_nowait()
+
+    async def put_many(self, items) -> None:
+        """Put every item in `items`, filling whatever space there is per wakeup."""
+        items = iter(items)
+        pending = next(items, _NOTHING)
+        while pending is not _NOTHING:
+            while self._size == self.capacity and not self._closed:
+                await self._wait(self._putters)
+            if self._closed:
+                raise ChannelClosed
+
+            while pending is not _NOTHING and self._size < self.capacity:
+                self._push(pending)
+                pending = next(items, _NOTHING)
+            self._wake_one(self._getters)
+            if self._size < self.capacity:
+                self._wake_one(self._putters)
+
+    async def get_many(self, max_items: int, timeout: float | None = None) -> list:
+        """Take up to `max_items` in one go, waiting only for the first one.
+
+        Returns an empty list if nothing arrived within `timeout` seconds.
+
+        Raises:
+            ChannelClosed: the channel is closed and has been drained.
+        """
+        if self._size == 0 and not self._closed:
+            try:
+                async with asyncio.timeout(timeout):
+                    while self._size == 0 and not self._closed:
+                        await self._wait(self._getters)
+            except TimeoutError:
+                return []
+        if self._size == 0:
+            raise ChannelClosed
+
+        batch = [self._pop() for _ in range(min(max_items, self._size))]
+        self._wake_one(self._putters)
+        if self._size:
+            self._wake_one(self._getters)
+        return batch
+
+    def close(self) -> None:
+        """Refuse further puts; consumers get what is left, then ChannelClosed."""
+        self._closed = True
+        for waiters in (self._getters, self._putters):
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except ChannelClosed:
+            raise StopAsyncIteration
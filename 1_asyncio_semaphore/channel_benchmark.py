@@ -0,0 +1,158 @@
+"""
+Benchmark the list + Condition buffer from condition.py against `Channel`.
+
+Both sides run the same producer/consumer loops as condition.py with the
+simulated work and prints taken out, so only the hand-off itself is timed.
+The second table shows how batching with `put_many` / `get_many` changes
+items/s and wakeups per item.
+"""
+
+import asyncio
+import time
+
+from channel import Channel, ChannelClosed
+
+CAPACITY = 5
+TOTAL_ITEMS = 100_000
+SCENARIOS = [(1, 1), (1, 2), (10, 10), (100, 100), (200, 200)]
+BATCH_CAPACITY = 64
+BATCH_SIZES = [1, 4, 16, 64]
+BATCH_SCENARIOS = [(1, 1), (10, 10)]
+
+
+async def condition_producer(buffer, condition, item_count):
+    for i in range(item_count):
+        async with condition:
+            while len(buffer) >= CAPACITY:
+                await condition.wait()
+            buffer.append(i)
+            condition.notify_all()
+
+
+async def condition_consumer(buffer, condition, state, counters):
+    while True:
+        async with condition:
+            while not buffer:
+                if state["done"]:
+                    return
+                await condition.wait()
+            buffer.pop(0)
+            counters["items"] += 1
+            condition.notify_all()
+
+
+async def run_condition(producers, consumers):
+    buffer = []
+    condition = asyncio.Condition()
+    state = {"done": False}
+    counters = {"items": 0}
+    per_producer = TOTAL_ITEMS // producers
+
+    consumer_tasks = [
+        asyncio.create_task(condition_consumer(buffer, condition, state, counters))
+        for _ in range(consumers)
+    ]
+    await asyncio.gather(
+        *(
+            condition_producer(buffer, condition, per_producer)
+            for _ in range(producers)
+        )
+    )
+    async with condition:
+        state["done"] = True
+        condition.notify_all()
+    await asyncio.gather(*consumer_tasks)
+    return counters
+
+
+async def channel_producer(channel, item_count):
+    for i in range(item_count):
+        await channel.put(i)
+
+
+async def channel_consumer(channel, counters):
+    async for _ in channel:
+        counters["items"] += 1
+
+
+async def run_channel(producers, consumers):
+    channel = Channel(CAPACITY)
+    counters = {"items": 0}
+    per_producer = TOTAL_ITEMS // producers
+
+    consumer_tasks = [
+        asyncio.create_task(channel_consumer(channel, counters))
+        for _ in range(consumers)
+    ]
+    await asyncio.gather(
+        *(channel_producer(channel, per_producer) for _ in range(producers))
+    )
+    channel.close()
+    await asyncio.gather(*consumer_tasks)
+    return counters
+
+
+async def batch_producer(channel, item_count, batch_size):
+    for start in range(0, item_count, batch_size):
+        await channel.put_many(range(start, min(start + batch_size, item_count)))
+
+
+async def batch_consumer(channel, batch_size, counters):
+    while True:
+        try:
+            batch = await channel.get_many(batch_size)
+        except ChannelClosed:
+            return
+        counters["items"] += len(batch)
+
+
+async def run_batched(producers, consumers, batch_size):
+    channel = Channel(BATCH_CAPACITY)
+    counters = {"items": 0}
+    per_producer = TOTAL_ITEMS // producers
+
+    consumer_tasks = [
+        asyncio.create_task(batch_consumer(channel, batch_size, counters))
+        for _ in range(consumers)
+    ]
+    await asyncio.gather(
+        *(batch_producer(channel, per_producer, batch_size) for _ in range(producers))
+    )
+    channel.close()
+    await asyncio.gather(*consumer_tasks)
+    counters["wakeups"] = channel.wakeups
+    return counters
+
+
+async def bench(runner, producers, consumers):
+    start = time.perf_counter()
+    counters = await runner(producers, consumers)
+    return counters["items"] / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{TOTAL_ITEMS} items, buffer capacity {CAPACITY}")
+    print(f"{'producers':>9} {'consumers':>9} {'condition/s':>12} {'channel/s':>12} {'speedup':>8}")
+    for producers, consumers in SCENARIOS:
+        condition_rate = await bench(run_condition, producers, consumers)
+        channel_rate = await bench(run_channel, producers, consumers)
+        print(
+            f"{producers:>9} {consumers:>9} {condition_rate:>12,.0f} "
+            f"{channel_rate:>12,.0f} {channel_rate / condition_rate:>7.1f}x"
+        )
+
+    print(f"\nBatched, channel capacity {BATCH_CAPACITY}")
+    print(f"{'producers':>9} {'consumers':>9} {'batch':>6} {'items/s':>12} {'wakeups/item':>13}")
+    for producers, consumers in BATCH_SCENARIOS:
+        for batch_size in BATCH_SIZES:
+            start = time.perf_counter()
+            counters = await run_batched(producers, consumers, batch_size)
+            rate = counters["items"] / (time.perf_counter() - start)
+            print(
+                f"{producers:>9} {consumers:>9} {batch_size:>6} {rate:>12,.0f} "
+                f"{counters['wakeups'] / counters['items']:>13.3f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
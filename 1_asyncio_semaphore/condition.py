@@ -1,5 +1,8 @@
 import asyncio
 import random
+import sys
+
+from channel import Channel
 
 
 async def producer(
@@ -43,6 +46,29 @@ async def consumer(buffer: list[int], condition: asyncio.Condition, name: str):
             condition.notify_all()  # Notify one waiting producer
 
 
+async def channel_producer(channel: Channel, name: str, item_count: int) -> None:
+    """Same as `producer`, but the channel does the waiting and waking."""
+    for i in range(item_count):
+        item = f"item {i + 1} from {name}"
+        await asyncio.sleep(random.uniform(0.1, 0.5))  # Simulate work before producing
+
+        if channel.full():
+            print(f"[{name}] Buffer is full ({len(channel)} items). Waiting...")
+        await channel.put(item)  # Wakes exactly one waiting consumer
+        print(f"[{name}] Produced {item}. Buffer size: {len(channel)}")
+
+    print(f"[{name}] Finished producing {item_count} items.")
+
+
+async def channel_consumer(channel: Channel, name: str) -> None:
+    """Consumes items until the channel is closed and drained."""
+    async for item in channel:  # Wakes exactly one waiting producer per item
+        print(f"[{name}] Consumed {item}. Buffer size: {len(channel)}")
+        await asyncio.sleep(random.uniform(0.5, 1.0))  # Simulate work after consuming
+
+    print(f"[{name}] Channel closed, exiting.")
+
+
 async def main():
     """Main function to run the producer-consumer example."""
     buffer = []
@@ -58,6 +84,26 @@ async def main():
     await asyncio.gather(producer1_task, consumer1_task, consumer2_task)
 
 
+async def channel_main():
+    """Producer-consumer example using a bounded ring-buffer channel."""
+    channel = Channel(5)  # Maximum buffer size is 5
+
+    producers = [
+        asyncio.create_task(channel_producer(channel, "Producer-1", 10)),
+    ]
+    consumers = [
+        asyncio.create_task(channel_consumer(channel, "Consumer-1")),
+        asyncio.create_task(channel_consumer(channel, "Consumer-2")),
+    ]
+
+    await asyncio.gather(*producers)
+    channel.close()  # Consumers drain what is left and exit
+    await asyncio.gather(*consumers)
+
+
 if __name__ == "__main__":
     print("Starting producer-consumer example...")
-    asyncio.run(main())
+    if "--channel" in sys.argv:
+        asyncio.run(channel_main())
+    else:
+        asyncio.run(main())
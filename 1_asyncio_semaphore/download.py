@@ -0,0 +1,178 @@
+"""
+Streaming response bodies straight to disk.
+
+Chunks coming off the socket are copied into a small reusable buffer and
+written out whenever it fills up, so a body is never joined into one big
+`bytes` object and memory use stays at roughly `buffer_size` per download no
+matter how large the payload is. The body is hashed as it streams past.
+"""
+
+import contextlib
+import hashlib
+import os
+from collections import namedtuple
+
+import aiohttp
+
+DownloadResult = namedtuple("DownloadResult", ("path", "size", "digest", "truncated"))
+
+
+class BufferPool:
+    """A free list of fixed-size bytearrays shared by all downloads."""
+
+    def __init__(self, buffer_size: int = 64 * 1024) -> None:
+        self.buffer_size = buffer_size
+        self._free: list[bytearray] = []
+
+    def acquire(self) -> bytearray:
+        if self._free:
+            return self._free.pop()
+        return bytearray(self.buffer_size)
+
+    def release(self, buffer: bytearray) -> None:
+        self._free.append(buffer)
+
+
+def _preallocate(f, size: int) -> None:
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError:
+            pass
+    f.truncate(size)
+
+
+async def stream_to_file(
+    response: aiohttp.ClientResponse,
+    path: str,
+    pool: BufferPool,
+    max_size: int | None = None,
+    hash_name: str = "sha256",
+) -> DownloadResult:
+    """Write the body of `response` to `path` without holding it in memory.
+
+    The body goes to a temporary file that then replaces `path`, so a file
+    already at `path` is never written through; it may be a hard link to a
+    cached body (see `Downloader.link`).
+
+    Args:
+        response (aiohttp.ClientResponse): response whose body is not read yet.
+        path (str): file to write the body to.
+        pool (BufferPool): pool to borrow the write buffer from.
+        max_size (int): stop after this many bytes and close the connection
+            instead of reading the rest of the body.
+        hash_name (str): hashlib algorithm used for the digest.
+    """
+    digest = hashlib.new(hash_name)
+    buffer = pool.acquire()
+    view = memoryview(buffer)
+    filled = 0
+    size = 0
+    truncated = False
+    tmp_path = f"{path}.tmp"
+
+    try:
+        with open(tmp_path, "wb") as f:
+            expected = response.content_length
+            if expected:
+                _preallocate(f, min(expected, max_size or expected))
+
+            async for chunk in response.content.iter_any():
+                if max_size is not None and size + len(chunk) > max_size:
+                    chunk = memoryview(chunk)[: max_size - size]
+                    truncated = True
+
+                digest.update(chunk)
+                size += len(chunk)
+                offset = 0
+                while offset < len(chunk):
+                    n = min(len(buffer) - filled, len(chunk) - offset)
+                    view[filled : filled + n] = chunk[offset : offset + n]
+                    filled += n
+                    offset += n
+                    if filled == len(buffer):
+                        f.write(view)
+                        filled = 0
+
+                if truncated:
+                    # don't drain the rest of the body, drop the connection
+                    response.close()
+                    break
+
+            f.write(view[:filled])
+            # the server may have sent less than Content-Length promised
+            f.truncate(size)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    finally:
+        view.release()
+        pool.release(buffer)
+
+    return DownloadResult(path, size, digest.hexdigest(), truncated)
+
+
+class Downloader:
+    """Download mode for the fetcher: one file per request under `directory`.
+
+    Args:
+        directory (str): where bodies are written, created if missing.
+        max_size (int): optional per-body size cutoff in bytes.
+        buffer_size (int): size of each reusable write buffer.
+    """
+
+    def __init__(
+        self, directory: str, max_size: int | None = None, buffer_size: int = 64 * 1024
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self.pool = BufferPool(buffer_size)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.body")
+
+    async def save(self, response: aiohttp.ClientResponse, name: str) -> DownloadResult:
+        return await stream_to_file(response, self.path(name), self.pool, self.max_size)
+
+    def link(self, source: str, name: str, hash_name: str = "sha256") -> DownloadResult:
+        """Put a body already on disk (e.g. in the cache) under `name`.
+
+        The file is hard-linked when it fits under `max_size` and both paths
+        are on the same filesystem, and copied otherwise.
+        """
+        path = self.path(name)
+        size = os.path.getsize(source)
+        truncated = self.max_size is not None and size > self.max_size
+        limit = self.max_size if truncated else size
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        copy = truncated
+        if not truncated:
+            try:
+                os.link(source, path)
+            except OSError:
+                copy = True
+
+        digest = hashlib.new(hash_name)
+        buffer = self.pool.acquire()
+        view = memoryview(buffer)
+        try:
+            with (
+                open(source, "rb") as src,
+                open(path, "wb") if copy else contextlib.nullcontext() as dst,
+            ):
+                left = limit
+                while left and (n := src.readinto(buffer)):
+                    n = min(n, left)
+                    digest.update(view[:n])
+                    if dst is not None:
+                        dst.write(view[:n])
+                    left -= n
+        finally:
+            view.release()
+            self.pool.release(buffer)
+        return DownloadResult(path, limit, digest.hexdigest(), truncated)
@@ -0,0 +1,150 @@
+"""
+An on-disk HTTP cache for the semaphore fetcher.
+
+For every URL we keep the ETag / Last-Modified validators and the body in
+`directory`. Later runs send them back as If-None-Match / If-Modified-Since,
+so an unchanged resource costs a 304 with no body. Responses that are still
+fresh (Cache-Control max-age) are served without any request at all, and
+identical URLs that are in flight at the same time share one request.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+import aiohttp
+
+from download import BufferPool, stream_to_file
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class HTTPCache:
+    """Validator and body store keyed by URL.
+
+    Args:
+        directory (str): where entries are kept, created if missing.
+    """
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pool = BufferPool()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def _path(self, url: str, suffix: str) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def body_path(self, url: str) -> str:
+        return self._path(url, "body")
+
+    def _load(self, url: str) -> dict | None:
+        try:
+            with open(self._path(url, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, url: str, entry: dict) -> None:
+        path = self._path(url, "json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(f"{path}.tmp", path)
+
+    def validators(self, url: str) -> dict:
+        """Conditional request headers for `url`, empty if nothing is cached."""
+        entry = self._load(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def update(
+        self, url: str, response: aiohttp.ClientResponse
+    ) -> tuple[int, str | None]:
+        """Record `response`; return the status the caller should see and
+        the cached body file, or None when the body is still in `response`.
+
+        A 304 refreshes the stored entry and returns the cached status. A
+        cacheable response has its body streamed into the cache.
+        """
+        expires = self._expires(response)
+        if response.status == 304:
+            entry = self._load(url)
+            if entry is not None:
+                self.revalidated += 1
+                entry["expires"] = expires
+                self._save(url, entry)
+                return entry["status"], self.body_path(url)
+
+        self.misses += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status != 200 or not (etag or last_modified or expires):
+            return response.status, None
+
+        body_path = self.body_path(url)
+        # written to a temporary file and renamed, so links to the old body
+        # in a download directory keep their content
+        await stream_to_file(response, body_path, self.pool)
+        self._save(
+            url,
+            {
+                "url": url,
+                "status": response.status,
+                "etag": etag,
+                "last_modified": last_modified,
+                "expires": expires,
+            },
+        )
+        return response.status, body_path
+
+    @staticmethod
+    def _expires(response: aiohttp.ClientResponse) -> float | None:
+        cache_control = response.headers.get("Cache-Control", "")
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return None
+        match = MAX_AGE.search(cache_control)
+        if match and int(match.group(1)) > 0:
+            return time.time() + int(match.group(1))
+        return None
+
+    async def fetch(self, url: str, fetch):
+        """Return `(url, status, body_path)` for `url`, calling `fetch()` only
+        when needed.
+
+        Fresh entries are served straight from disk and concurrent callers for
+        the same URL wait on a single `fetch()`, which returns the same triple.
+        """
+        entry = self._load(url)
+        if entry and entry.get("expires") and entry["expires"] > time.time():
+            self.hits += 1
+            return url, entry["status"], self.body_path(url)
+
+        task = self._in_flight.get(url)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._in_flight[url] = asyncio.create_task(
+                fetch(), name=asyncio.current_task().get_name()
+            )
+            task.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        # shield so one cancelled caller doesn't cancel the request for the rest
+        return await asyncio.shield(task)
+
+    def report(self) -> None:
+        print(
+            f"Cache: {self.hits} hits, {self.revalidated} revalidated, "
+            f"{self.misses} misses, {self.coalesced} coalesced"
+        )
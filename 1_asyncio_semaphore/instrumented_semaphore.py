@@ -0,0 +1,149 @@
+"""
+A semaphore that measures itself.
+
+Records how long callers wait to acquire, how long they hold a slot and how
+many slots are in use over time. From the hold times at each occupancy level
+we estimate throughput (Little's law: slots in use / mean hold time) and
+suggest the smallest limit that gets close to the best throughput seen, so
+`max_concurrent` can be picked from data instead of by guesswork.
+
+Aggregates are kept per occupancy level and only the most recent samples are
+retained, so memory stays bounded however many acquisitions there are.
+"""
+
+import asyncio
+import contextlib
+import statistics
+import time
+from collections import deque
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class InstrumentedSemaphore:
+    """`asyncio.Semaphore` wrapper that records wait/hold/occupancy.
+
+    Args:
+        value (int): number of slots.
+        max_samples (int): how many recent wait/hold samples and timeline
+            points to keep.
+    """
+
+    def __init__(self, value: int, max_samples: int = 10_000) -> None:
+        self.limit = value
+        self.in_use = 0
+        self._semaphore = asyncio.Semaphore(value)
+        self._started = self._last_change = time.monotonic()
+
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.waits: deque[float] = deque(maxlen=max_samples)
+        self.holds: deque[float] = deque(maxlen=max_samples)
+        # (seconds since creation, slots in use) after every change
+        self.timeline: deque[tuple[float, int]] = deque(maxlen=max_samples)
+        # indexed by occupancy level
+        self._time_at = [0.0] * (value + 1)
+        self._hold_total = [0.0] * (value + 1)
+        self._hold_count = [0] * (value + 1)
+
+    def locked(self) -> bool:
+        return self._semaphore.locked()
+
+    def _change(self, delta: int) -> None:
+        now = time.monotonic()
+        self._time_at[self.in_use] += now - self._last_change
+        self._last_change = now
+        self.in_use += delta
+        self.timeline.append((now - self._started, self.in_use))
+
+    async def acquire(self) -> tuple[float, int]:
+        """Acquire a slot; pass the returned token back to `release`."""
+        start = time.monotonic()
+        await self._semaphore.acquire()
+        wait = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += wait
+        self.waits.append(wait)
+        self._change(+1)
+        return time.monotonic(), self.in_use
+
+    def release(self, token: tuple[float, int]) -> None:
+        acquired_at, level = token
+        hold = time.monotonic() - acquired_at
+        self.holds.append(hold)
+        self._hold_total[level] += hold
+        self._hold_count[level] += 1
+        self._change(-1)
+        self._semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        token = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def throughput_by_level(self) -> dict[int, float]:
+        """Estimated completions per second at each occupancy level seen."""
+        return {
+            level: level * self._hold_count[level] / self._hold_total[level]
+            for level in range(1, self.limit + 1)
+            if self._hold_count[level] and self._hold_total[level] > 0
+        }
+
+    def suggest_limit(self, fraction: float = 0.9) -> int | None:
+        """Smallest limit whose throughput is within `fraction` of the best."""
+        rates = self.throughput_by_level()
+        if not rates:
+            return None
+        best = max(rates.values())
+        return min(level for level, rate in rates.items() if rate >= fraction * best)
+
+    def summary(self) -> dict:
+        self._change(0)
+        elapsed = sum(self._time_at)
+        avg_in_use = (
+            sum(level * t for level, t in enumerate(self._time_at)) / elapsed
+            if elapsed
+            else 0.0
+        )
+        return {
+            "limit": self.limit,
+            "acquired": self.acquired,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "p95_wait": _percentile(self.waits, 0.95),
+            "avg_hold": statistics.fmean(self.holds) if self.holds else 0.0,
+            "p95_hold": _percentile(self.holds, 0.95),
+            "avg_in_use": avg_in_use,
+            "saturated": self._time_at[self.limit] / elapsed if elapsed else 0.0,
+            "throughput": self.throughput_by_level(),
+            "suggested_limit": self.suggest_limit(),
+        }
+
+    def report(self) -> None:
+        s = self.summary()
+        print("--- Semaphore occupancy ---")
+        print(
+            f"limit={s['limit']} acquired={s['acquired']} "
+            f"wait avg={s['avg_wait']:.3f}s p95={s['p95_wait']:.3f}s "
+            f"hold avg={s['avg_hold']:.3f}s p95={s['p95_hold']:.3f}s"
+        )
+        print(
+            f"avg slots in use={s['avg_in_use']:.2f}, "
+            f"all slots busy {s['saturated']:.0%} of the time"
+        )
+        for level, rate in s["throughput"].items():
+            print(f"  {level} in use: ~{rate:.1f} requests/s")
+        suggested = s["suggested_limit"]
+        if suggested is None:
+            return
+        if suggested == self.limit and s["saturated"] > 0.5:
+            print(f"Throughput still rising at {self.limit}, try a higher limit")
+        else:
+            print(f"Suggested max_concurrent: {suggested}")
@@ -0,0 +1,210 @@
+"""
+A keyed semaphore: every key (e.g. a URL host) gets its own concurrency limit,
+and all keys share one global cap.
+
+Per-key limits adapt to what we observe (AIMD, like TCP congestion control):
+  * a fast, successful request grows the limit by ~1 slot per "round"
+  * a request much slower than the best latency seen shrinks it a little
+  * an error halves it
+so a slow or failing host stops hogging slots that fast hosts could be using.
+
+Only `max_hosts` keys are tracked at a time: once a new key would go over,
+keys with nothing in flight and nobody waiting are forgotten, along with
+their learned limit and counters.
+"""
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from instrumented_semaphore import InstrumentedSemaphore
+
+
+class _Slot:
+    """Handle yielded while a slot is held; set `error` to report a failure."""
+
+    __slots__ = ("key", "error")
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.error = False
+
+
+class HostState:
+    """Limit, waiters and counters for a single key."""
+
+    def __init__(self, limit: float) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.best_latency = None
+        self.avg_latency = None
+        self.acquired = 0
+        self.errors = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit)
+
+
+class KeyedSemaphore:
+    """Semaphore with an adaptive limit per key plus a global cap.
+
+    Args:
+        global_limit (int): maximum number of slots held across all keys.
+        initial_limit (int): starting limit for a key seen for the first time.
+        min_limit (int): a key's limit never drops below this.
+        max_limit (int): a key's limit never grows above this (defaults to
+            `global_limit`).
+        slow_factor (float): a request slower than `slow_factor` times the
+            best latency seen for its key counts as a congestion signal.
+        max_hosts (int): number of keys tracked before idle ones are evicted.
+    """
+
+    def __init__(
+        self,
+        global_limit: int,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int | None = None,
+        slow_factor: float = 2.0,
+        max_hosts: int = 1000,
+    ) -> None:
+        self.global_limit = global_limit
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit or global_limit
+        self.slow_factor = slow_factor
+        self.max_hosts = max_hosts
+        self.global_slots = InstrumentedSemaphore(global_limit)
+        self._hosts: dict[str, HostState] = {}
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return urlsplit(url).netloc
+
+    def _host(self, key: str) -> HostState:
+        host = self._hosts.get(key)
+        if host is None:
+            if len(self._hosts) >= self.max_hosts:
+                self._evict_idle()
+            host = self._hosts[key] = HostState(float(self.initial_limit))
+        return host
+
+    def _evict_idle(self) -> None:
+        idle = [
+            key
+            for key, host in self._hosts.items()
+            if not host.in_flight and not host.waiters
+        ]
+        for key in idle:
+            del self._hosts[key]
+
+    async def _acquire_host(self, host: HostState) -> None:
+        if host.in_flight < host.capacity and not host.waiters:
+            host.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        host.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # we were handed a slot just as we got cancelled, pass it on
+                self._release_host(host)
+            elif waiter in host.waiters:
+                # _wake() may already have dropped it as done
+                host.waiters.remove(waiter)
+            raise
+
+    def _release_host(self, host: HostState) -> None:
+        host.in_flight -= 1
+        self._wake(host)
+
+    def _wake(self, host: HostState) -> None:
+        while host.waiters and host.in_flight < host.capacity:
+            waiter = host.waiters.popleft()
+            if not waiter.done():
+                host.in_flight += 1
+                waiter.set_result(None)
+
+    def _observe(self, host: HostState, latency: float, ok: bool) -> None:
+        if not ok:
+            host.errors += 1
+            host.limit = max(self.min_limit, host.limit / 2)
+            return
+
+        if host.best_latency is None or latency < host.best_latency:
+            host.best_latency = latency
+        if host.avg_latency is None:
+            host.avg_latency = latency
+        else:
+            host.avg_latency = 0.8 * host.avg_latency + 0.2 * latency
+
+        if latency > host.best_latency * self.slow_factor:
+            host.limit = max(self.min_limit, host.limit * 0.9)
+        else:
+            host.limit = min(self.max_limit, host.limit + 1 / host.limit)
+            self._wake(host)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, key: str):
+        """Hold one slot for `key` (and one global slot) for the block.
+
+        An exception raised inside the block, or setting `slot.error`, is
+        treated as a failed request for the purpose of sizing the limit.
+        """
+        host = self._host(key)
+        wait_start = time.monotonic()
+        await self._acquire_host(host)
+        try:
+            token = await self.global_slots.acquire()
+        except BaseException:
+            self._release_host(host)
+            raise
+
+        waited = time.monotonic() - wait_start
+        host.acquired += 1
+        host.total_wait += waited
+        host.max_wait = max(host.max_wait, waited)
+
+        slot = _Slot(key)
+        start = time.monotonic()
+        ok = False
+        try:
+            yield slot
+            ok = not slot.error
+        finally:
+            self.global_slots.release(token)
+            self._observe(host, time.monotonic() - start, ok)
+            self._release_host(host)
+
+    def stats(self) -> dict[str, dict]:
+        """Per-key counters, wait times and current limits."""
+        return {
+            key: {
+                "limit": host.capacity,
+                "acquired": host.acquired,
+                "errors": host.errors,
+                "avg_wait": host.total_wait / host.acquired if host.acquired else 0.0,
+                "max_wait": host.max_wait,
+                "avg_latency": host.avg_latency,
+            }
+            for key, host in self._hosts.items()
+        }
+
+    def report(self) -> None:
+        print("--- Slot wait per host ---")
+        for key, s in self.stats().items():
+            latency = f"{s['avg_latency']:.3f}s" if s["avg_latency"] else "n/a"
+            print(
+                f"{key}: limit={s['limit']} requests={s['acquired']} errors={s['errors']} "
+                f"avg_wait={s['avg_wait']:.3f}s max_wait={s['max_wait']:.3f}s "
+                f"avg_latency={latency}"
+            )
+        self.global_slots.report()
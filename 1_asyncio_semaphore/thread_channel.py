@@ -0,0 +1,149 @@
+"""
+A channel that worker threads put into and coroutines get from.
+
+Calling `loop.call_soon_threadsafe` for every item writes to the loop's
+self-pipe and queues a callback per item, which swamps the loop when items
+come in fast. Here thread producers append to a shared deque under a lock
+and only schedule a loop wakeup when a consumer is actually waiting and no
+wakeup is already on its way, so a burst of puts costs a single callback.
+When the channel is full the producing thread blocks, just like
+`queue.Queue.put`.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+from channel import ChannelClosed
+
+
+class ThreadChannel:
+    """Bounded thread-to-asyncio channel.
+
+    Args:
+        capacity (int): maximum number of buffered items.
+        loop (asyncio.AbstractEventLoop): loop the consumers run on, defaults
+            to the running loop.
+    """
+
+    def __init__(self, capacity: int, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        self.capacity = capacity
+        self._loop = loop or asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._items: deque = deque()
+        self._closed = False
+        # guarded by _lock
+        self._consumers_waiting = 0
+        self._wakeup_scheduled = False
+        # only touched from the loop thread
+        self._getters: deque[asyncio.Future] = deque()
+        # number of call_soon_threadsafe calls made by producers
+        self.loop_wakeups = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # thread side
+
+    def _notify_loop(self) -> bool:
+        """Decide, under the lock, whether the loop needs to be woken up."""
+        if self._consumers_waiting and not self._wakeup_scheduled:
+            self._wakeup_scheduled = True
+            self.loop_wakeups += 1
+            return True
+        return False
+
+    def put(self, item, timeout: float | None = None) -> None:
+        """Put `item` from any thread, blocking while the channel is full.
+
+        Raises:
+            ChannelClosed: the channel was closed.
+            TimeoutError: no space was freed within `timeout` seconds.
+        """
+        self.put_many((item,), timeout)
+
+    def put_many(self, items, timeout: float | None = None) -> None:
+        """Put a batch of items from any thread with one loop wakeup at most."""
+        items = list(items)
+        while items:
+            with self._not_full:
+                if not self._not_full.wait_for(
+                    lambda: self._closed or len(self._items) < self.capacity, timeout
+                ):
+                    raise TimeoutError
+                if self._closed:
+                    raise ChannelClosed
+                space = self.capacity - len(self._items)
+                self._items.extend(items[:space])
+                items = items[space:]
+                wake = self._notify_loop()
+            if wake:
+                self._loop.call_soon_threadsafe(self._wake_getters)
+
+    def close(self) -> None:
+        """Close from any thread: producers stop, consumers drain and stop."""
+        with self._not_full:
+            self._closed = True
+            self._not_full.notify_all()
+            wake = self._notify_loop()
+        if wake:
+            self._loop.call_soon_threadsafe(self._wake_getters)
+
+    # loop side
+
+    def _wake_getters(self) -> None:
+        with self._lock:
+            self._wakeup_scheduled = False
+            available = len(self._items) if not self._closed else len(self._getters)
+        while self._getters and available:
+            waiter = self._getters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    async def _wait(self) -> None:
+        waiter = self._loop.create_future()
+        self._getters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._wake_getters()
+            elif waiter in self._getters:
+                self._getters.remove(waiter)
+            raise
+        finally:
+            with self._lock:
+                self._consumers_waiting -= 1
+
+    async def get(self):
+        """Take the oldest item, waiting while the channel is empty.
+
+        Raises:
+            ChannelClosed: the channel is closed and has been drained.
+        """
+        return (await self.get_many(1))[0]
+
+    async def get_many(self, max_items: int) -> list:
+        """Take up to `max_items` at once, waiting only for the first one."""
+        while True:
+            with self._not_full:
+                if self._items:
+                    n = min(max_items, len(self._items))
+                    batch = [self._items.popleft() for _ in range(n)]
+                    self._not_full.notify(n)
+                    return batch
+                if self._closed:
+                    raise ChannelClosed
+                self._consumers_waiting += 1
+            await self._wait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except ChannelClosed:
+            raise StopAsyncIteration
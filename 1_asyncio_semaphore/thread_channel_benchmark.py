@@ -0,0 +1,100 @@
+"""
+Benchmark feeding async consumers from worker threads.
+
+Baseline: every produced item is handed to the loop with its own
+`loop.call_soon_threadsafe(queue.put_nowait, item)`. Against it we run
+`ThreadChannel`, where threads block on a bounded buffer and loop wakeups
+are coalesced.
+"""
+
+import asyncio
+import threading
+import time
+
+from thread_channel import ThreadChannel
+
+ITEMS_PER_THREAD = 50_000
+CAPACITY = 1024
+SCENARIOS = [(1, 1), (4, 4), (16, 4)]
+
+
+def threaded_producers(threads, target):
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+async def run_call_soon(threads, consumers):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    counters = {"items": 0, "loop_wakeups": 0}
+    lock = threading.Lock()
+
+    def produce():
+        for i in range(ITEMS_PER_THREAD):
+            loop.call_soon_threadsafe(queue.put_nowait, i)
+            with lock:
+                counters["loop_wakeups"] += 1
+
+    async def consume():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            counters["items"] += 1
+
+    consumer_tasks = [asyncio.create_task(consume()) for _ in range(consumers)]
+    workers = threaded_producers(threads, produce)
+    await asyncio.to_thread(lambda: [worker.join() for worker in workers])
+    for _ in range(consumers):
+        queue.put_nowait(None)
+    await asyncio.gather(*consumer_tasks)
+    return counters
+
+
+async def run_thread_channel(threads, consumers, batch_size):
+    channel = ThreadChannel(CAPACITY)
+    counters = {"items": 0}
+
+    def produce():
+        for start in range(0, ITEMS_PER_THREAD, batch_size):
+            channel.put_many(range(start, min(start + batch_size, ITEMS_PER_THREAD)))
+
+    async def consume():
+        async for _ in channel:
+            counters["items"] += 1
+
+    consumer_tasks = [asyncio.create_task(consume()) for _ in range(consumers)]
+    workers = threaded_producers(threads, produce)
+    await asyncio.to_thread(lambda: [worker.join() for worker in workers])
+    channel.close()
+    await asyncio.gather(*consumer_tasks)
+    counters["loop_wakeups"] = channel.loop_wakeups
+    return counters
+
+
+async def bench(runner, *args):
+    start = time.perf_counter()
+    counters = await runner(*args)
+    rate = counters["items"] / (time.perf_counter() - start)
+    return rate, counters["loop_wakeups"] / counters["items"]
+
+
+async def main():
+    print(f"{ITEMS_PER_THREAD} items per thread, channel capacity {CAPACITY}")
+    print(f"{'threads':>7} {'consumers':>9} {'mode':>22} {'items/s':>10} {'wakeups/item':>13}")
+    for threads, consumers in SCENARIOS:
+        modes = [("call_soon_threadsafe", run_call_soon, ())]
+        modes += [
+            (f"ThreadChannel batch={b}", run_thread_channel, (b,)) for b in (1, 64)
+        ]
+        for label, runner, extra in modes:
+            rate, wakeups = await bench(runner, threads, consumers, *extra)
+            print(
+                f"{threads:>7} {consumers:>9} {label:>22} {rate:>10,.0f} {wakeups:>13.4f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,12 @@
 import asyncio
+import os
+import sys
+
+# cancel_watch.py and structured.py are shared from the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cancel_watch import CancelWatch
+from structured import GatherReport, structured_gather
 
 
 async def func_a() -> str:
@@ -27,10 +35,27 @@ async def func_c():
     return "result from c"
 
 
-async def main():
-    result = await asyncio.gather(func_a(), func_b(), func_c())
+async def main(watch=None):
+    if watch is not None:
+        watch.install()
+    if "--fail-fast" in sys.argv:
+        # func_c's error cancels func_a instead of letting it sleep on
+        report = GatherReport()
+        try:
+            result = await structured_gather(func_a(), func_b(), func_c(), report=report)
+        finally:
+            report.log()
+    else:
+        result = await asyncio.gather(func_a(), func_b(), func_c())
     print(result)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # python exception_tasks.py --watch-cancel reports tasks that swallow
+    # cancellation, including the ones asyncio.run cancels on the way out
+    watch = CancelWatch() if "--watch-cancel" in sys.argv else None
+    try:
+        asyncio.run(main(watch))
+    finally:
+        if watch is not None:
+            watch.report()
@@ -8,7 +8,13 @@ from datetime import datetime
 from random import randint
 import aiohttp
 import logging
+import os
+import sys
 
+# structured.py is shared from the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from structured import GatherReport, structured_gather
 
 LOGGER_FORMAT = "%(asctime)s %(message)s"
 URL_TEMPLATE = "https://hacker-news.firebaseio.com/v0/item/{}.json"
@@ -70,9 +76,9 @@ async def post_number_of_comments(
         post_number_of_comments(session, fetcher, kid_id) for kid_id in response["kids"]
     ]
 
-    # schedule the tasks and retrieve results
+    # schedule the tasks and retrieve results, the first failure cancels the rest
     try:
-        results = await asyncio.gather(*tasks)
+        results = await structured_gather(*tasks)
     except (BoomException, Exception) as e:
         log.error(f"Error retrieving post : {post_id}")
         log.error(f"Exception: {e}")
@@ -105,7 +111,9 @@ async def get_comments_of_top_stories(
         post_number_of_comments(session, fetcher, post_id)
         for post_id in response[:limit]
     ]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    report = GatherReport()
+    results = await structured_gather(*tasks, collect_errors=True, report=report)
+    report.log(log.info)
 
     # we can safely iterate the results
     for post_id, result in zip(response[:limit], results):
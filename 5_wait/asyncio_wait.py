@@ -8,7 +8,13 @@ from datetime import datetime
 from random import randint
 import aiohttp
 import logging
+import os
+import sys
 
+# structured.py is shared from the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from structured import GatherReport, structured_gather
 
 LOGGER_FORMAT = "%(asctime)s %(message)s"
 URL_TEMPLATE = "https://hacker-news.firebaseio.com/v0/item/{}.json"
@@ -65,38 +71,32 @@ async def post_number_of_comments(
     # calculate this post's comments as number of comments
     number_of_comments = len(response["kids"])
 
+    # create recursive tasks for all comments
+    tasks = [
+        post_number_of_comments(session, fetcher, kid_id) for kid_id in response["kids"]
+    ]
+
+    # schedule the tasks and retrieve results, the first failure cancels the
+    # siblings and so does cancelling this coroutine
     try:
-        # create recursive tasks for all comments
-        tasks = [
-            asyncio.create_task(post_number_of_comments(session, fetcher, kid_id))
-            for kid_id in response["kids"]
-        ]
-
-        # schedule the tasks and retrieve results
-        try:
-            results = await asyncio.gather(*tasks)
-        except (BoomException, Exception) as e:
-            log.error(f"Error retrieving post : {post_id}")
-            log.error(f"Exception: {e}")
-            raise e
-
-        # reduce the descendents comments and add it to this post's
-        number_of_comments += sum(results)
-        log.debug("{:^6} > {} comments".format(post_id, number_of_comments))
-
-        return number_of_comments
+        results = await structured_gather(*tasks)
     except asyncio.CancelledError:
-        if tasks:
-            log.info(
-                "Comments for post {} cancelled, cancelling {} child tasks".format(
-                    post_id, len(tasks)
-                )
+        log.info(
+            "Comments for post {} cancelled, cancelled {} child tasks".format(
+                post_id, len(tasks)
             )
-            for task in tasks:
-                task.cancel()
-        else:
-            log.info("Comments for post {} cancelled".format(post_id))
+        )
         raise
+    except (BoomException, Exception) as e:
+        log.error(f"Error retrieving post : {post_id}")
+        log.error(f"Exception: {e}")
+        raise e
+
+    # reduce the descendents comments and add it to this post's
+    number_of_comments += sum(results)
+    log.debug("{:^6} > {} comments".format(post_id, number_of_comments))
+
+    return number_of_comments
 
 
 async def get_comments_of_top_stories(
@@ -115,27 +115,20 @@ async def get_comments_of_top_stories(
         log.error("Unexpected exception: {}".format(e))
         return
 
-    tasks: dict = {
-        asyncio.create_task(post_number_of_comments(session, fetcher, post_id)): post_id
-        for post_id in response[:limit]
-    }
-
-    # return on first exception to cancel any pending tasks
-    done, pending = await asyncio.wait(
-        tasks.keys(), return_when=asyncio.FIRST_EXCEPTION
-    )
-
-    # if there are pending tasks is because there was an exception cancel any pending tasks
-    for pending_task in pending:
-        pending_task.cancel()
-
-    # process the done tasks
-    for done_task in done:
-        # if an exception is raised one of the Tasks will raise
-        try:
-            result = done_task.result()  # noqa: F841
-        except (BoomException, Exception):
-            print(f"Error retrieving comments for top stories: {tasks[done_task]}")
+    post_ids = response[:limit]
+    tasks = [
+        post_number_of_comments(session, fetcher, post_id) for post_id in post_ids
+    ]
+
+    # the first exception cancels the pending tasks and waits for them to finish
+    report = GatherReport()
+    try:
+        await structured_gather(*tasks, report=report)
+    except (BoomException, Exception):
+        for post_id, child in zip(post_ids, report.children):
+            if child.outcome == "error":
+                print(f"Error retrieving comments for top stories: {post_id}")
+    report.log(log.info)
 
     return fetcher.fetch_counter  # return the fetch count
 
@@ -1,16 +1,16 @@
+import sys
 import time
 import random
 import asyncio
-import aiohttp
+
+from sessions import aiohttp_get_headers, provider
+from warmup import warm_up
+from window import CompletionWindow
 
 URL = "https://api.github.com/events"
 MAX_CLIENTS = 3
-
-
-async def aiohttp_get(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            return response
+MAX_IN_FLIGHT = 100  # clients running at once, the rest wait their turn
+CLIENT_TIMEOUT = 10  # seconds
 
 
 async def fetch_async(pid):
@@ -24,10 +24,10 @@ async def fetch_async(pid):
 
     await asyncio.sleep(sleepy_time)
 
-    response = await aiohttp_get(URL)
-    datetime = response.headers.get("Date")
+    # only the Date header is needed, so the body is never downloaded
+    headers = await aiohttp_get_headers(URL)
+    datetime = headers.get("Date")
 
-    response.close()
     return "Process {}: {}, took: {:.2f} seconds".format(
         pid, datetime, time.time() - start
     )
@@ -35,12 +35,22 @@ async def fetch_async(pid):
 
 async def main():
     start = time.time()
-    tasks = [fetch_async(i) for i in range(1, MAX_CLIENTS + 1)]
-    for i, task in enumerate(asyncio.as_completed(tasks)):
-        result = await task
-        print("{} {}".format(">>" * (i + 1), result))
+    async with provider:
+        # a generator, so clients are only created as room frees up
+        clients = (fetch_async(i) for i in range(1, MAX_CLIENTS + 1))
+        window = CompletionWindow(clients, MAX_IN_FLIGHT, timeout=CLIENT_TIMEOUT)
+        i = 0
+        async for task in window:
+            result = await task
+            i += 1
+            print("{} {}".format(">>" * i, result))
 
     print("Process took: {:.2f} seconds".format(time.time() - start))
+    print("Throughput: {:.2f} clients/second".format(window.rate))
+
 
+if "--warm" in sys.argv:
+    # connect to the host before the first request goes out
+    warm_up(provider, [URL])
 
 asyncio.run(main())
@@ -1,8 +1,11 @@
 from collections import namedtuple
+import sys
 import time
 import asyncio
-from concurrent.futures import FIRST_COMPLETED
-import aiohttp
+
+from hedge import RaceReport, hedged
+from sessions import aiohttp_get_json, provider
+from warmup import warm_up
 
 Service = namedtuple("Service", ("name", "url", "ip_attr"))
 
@@ -12,12 +15,6 @@ SERVICES = (
 )
 
 
-async def aiohttp_get_json(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            return await response.json()
-
-
 async def fetch_ip(service):
     start = time.time()
     print("Fetching IP from {}".format(service.name))
@@ -31,13 +28,20 @@ async def fetch_ip(service):
 
 
 async def main():
-    futures = [asyncio.create_task(fetch_ip(service)) for service in SERVICES]
-    done, pending = await asyncio.wait(futures, return_when=FIRST_COMPLETED)
+    race = RaceReport()
+    async with provider:
+        # ask the fastest known service, hedge to the next only if it's slow
+        _, result = await hedged(SERVICES, fetch_ip, report=race)
 
-    print(done.pop().result())
+    print(result)
+    print(race)
 
 
 if __name__ == "__main__":
+    if "--warm" in sys.argv:
+        # connect to every service before the first request goes out
+        warm_up(provider, [service.url for service in SERVICES])
+
     ioloop = asyncio.get_event_loop()
     ioloop.run_until_complete(main())
     ioloop.close()
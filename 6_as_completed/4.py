@@ -1,7 +1,11 @@
 from collections import namedtuple
+import sys
 import time
 import asyncio
-import aiohttp
+
+from registry import registry
+from sessions import aiohttp_get_json, provider
+from warmup import warm_up
 
 Service = namedtuple("Service", ("name", "url", "ip_attr"))
 
@@ -11,11 +15,7 @@ SERVICES = (
     Service("broken", "http://no-way-this-is-going-to-work.com/json", "ip"),
 )
 
-
-async def aiohttp_get_json(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            return await response.json()
+ROUNDS = 3
 
 
 async def fetch_ip(service):
@@ -23,7 +23,10 @@ async def fetch_ip(service):
     print("Fetching IP from {}".format(service.name))
 
     try:
-        json_response = await aiohttp_get_json(service.url)
+        # records latency or failure, enough failures open the circuit
+        json_response = await registry.call(
+            service, lambda: aiohttp_get_json(service.url)
+        )
     except Exception:
         return "{} is unresponsive".format(service.name)
 
@@ -35,11 +38,26 @@ async def fetch_ip(service):
 
 
 async def main():
-    tasks = [asyncio.create_task(fetch_ip(service)) for service in SERVICES]
-    done, _ = await asyncio.wait(tasks)
-
-    for task in done:
-        print(task.result())
-
+    async with provider:
+        for round_no in range(1, ROUNDS + 1):
+            print(f"--- Round {round_no} ---")
+            # services with an open circuit are skipped without a request
+            services = registry.ranked(SERVICES)
+            for service in SERVICES:
+                if service not in services:
+                    print(f"{service.name} circuit is open, skipping")
+            if not services:
+                continue
+
+            tasks = [asyncio.create_task(fetch_ip(service)) for service in services]
+            done, _ = await asyncio.wait(tasks)
+
+            for task in done:
+                print(task.result())
+
+
+if "--warm" in sys.argv:
+    # connect to every service before the first request goes out
+    warm_up(provider, [service.url for service in SERVICES])
 
 asyncio.run(main())
@@ -1,9 +1,14 @@
+import os
+import sys
 import time
 import random
 import asyncio
-import aiohttp
 from collections import namedtuple
-from concurrent.futures import FIRST_COMPLETED
+
+from hedge import RaceReport, hedged
+from ip_cache import TTLCache
+from sessions import aiohttp_get_json, provider
+from warmup import warm_up
 
 Service = namedtuple("Service", ("name", "url", "ip_attr"))
 
@@ -13,12 +18,9 @@ SERVICES = (
 )
 
 DEFAULT_TIMEOUT = 0.01
+IP_TTL = 300  # seconds before the cached IP is refreshed in the background
 
-
-async def aiohttp_get_json(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            return await response.json()
+ip_cache = TTLCache(os.path.join(os.path.dirname(__file__), ".ip_cache.json"), IP_TTL)
 
 
 async def fetch_ip(service):
@@ -29,7 +31,8 @@ async def fetch_ip(service):
     try:
         json_response = await aiohttp_get_json(service.url)
     except Exception:
-        return f"{service.name} is unresponsive"
+        print(f"{service.name} is unresponsive")
+        raise
 
     ip = json_response[service.ip_attr]
 
@@ -39,22 +42,38 @@ async def fetch_ip(service):
     return ip
 
 
+async def lookup_ip(timeout):
+    race = RaceReport()
+    try:
+        async with asyncio.timeout(timeout):
+            # one request at a time, hedging only when a service is slow
+            _, ip = await hedged(SERVICES, fetch_ip, report=race)
+    finally:
+        print(race)
+    return ip
+
+
 async def main():
     timeout = 5  # seconds
     response = {"message": "Result from asynchronous.", "ip": "not available"}
 
-    tasks = [asyncio.create_task(fetch_ip(service)) for service in SERVICES]
-    done, pending = await asyncio.wait(
-        tasks, timeout=timeout, return_when=FIRST_COMPLETED
-    )
-
-    for task in pending:
-        task.cancel()
+    async with provider:
+        start = time.perf_counter()
+        try:
+            # served from the cache when we have a value, even a stale one
+            response["ip"] = await ip_cache.get("ip", lambda: lookup_ip(timeout))
+        except Exception:
+            pass  # every service failed or timed out, keep "not available"
+        print(f"IP lookup took {(time.perf_counter() - start) * 1000:.2f} ms")
 
-    for task in done:
-        response["ip"] = task.result()
+        # let a background refresh land in the cache file before we exit
+        await ip_cache.drain(timeout)
 
     print(response)
 
 
+if "--warm" in sys.argv:
+    # connect to every service before the first request goes out
+    warm_up(provider, [service.url for service in SERVICES])
+
 asyncio.run(main())
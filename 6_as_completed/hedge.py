@@ -0,0 +1,148 @@
+"""
+Hedged requests: ask one service, and only ask the next if it is slow.
+
+Firing the lookup at every service at once and keeping the first reply (2.py,
+3.py, 7.py) multiplies upstream load by the number of services. Instead we
+send to the service with the best observed latency first and only "hedge" to
+the next one if no reply arrived within that service's p95 latency. A
+failure moves on to the next service straight away. As soon as one reply
+comes back the others are cancelled.
+
+Most calls then cost a single request, while the tail stays close to what
+racing every service gave us.
+
+Cancelled losers are awaited, for at most `CLEANUP_TIMEOUT`, before
+`hedged` returns. By then aiohttp has released or closed their connections
+instead of leaving them to a later loop iteration. What the losers cost is
+recorded in a `RaceReport`.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+
+from registry import registry
+from sessions import ByteCount, received
+
+# seconds to wait before hedging away from a service we know nothing about,
+# and the longest we ever wait (failures count as very slow in the tracker)
+MAX_DELAY = 0.5
+CLEANUP_TIMEOUT = 1.0  # seconds to wait for cancelled losers to finish
+
+
+class RaceReport:
+    """What the requests that did not win one `hedged` race cost.
+
+    `wasted_ms` is how long they ran, `wasted_bytes` the response body bytes
+    they read through the shared session, and `abandoned` the number still
+    running after `CLEANUP_TIMEOUT`.
+    """
+
+    def __init__(self) -> None:
+        self.winner = None
+        self.requests = 0
+        self.wasted_ms = 0.0
+        self.wasted_bytes = 0
+        self.abandoned = 0
+
+    def _waste(self, started: float, count: ByteCount) -> None:
+        self.wasted_ms += (time.monotonic() - started) * 1000
+        self.wasted_bytes += count.bytes
+
+    def __str__(self) -> str:
+        winner = self.winner.name if self.winner else None
+        return (
+            f"winner: {winner}, requests: {self.requests}, "
+            f"wasted: {self.wasted_ms:.1f} ms / {self.wasted_bytes} bytes, "
+            f"abandoned: {self.abandoned}"
+        )
+
+
+async def hedged(services, fetch, tracker=registry, pct=0.95, report=None):
+    """Return `(service, result)` from the first service to answer `fetch(service)`.
+
+    Args:
+        services: candidates, each with a `name`.
+        fetch: coroutine function called with a service; raises on failure.
+            Each request is claimed with `tracker.allow()` here, so `fetch`
+            should not go through `ServiceRegistry.call()` as well.
+        tracker (LatencyTracker): observed latencies used for ordering and
+            hedge delays, updated with every reply, failure or cancelled
+            loser. The default `ServiceRegistry` also skips services whose
+            circuit is open.
+        pct (float): latency percentile to wait for before hedging.
+        report (RaceReport): filled in with the winner and the wasted work.
+
+    Raises:
+        The last error if every service failed.
+        LookupError: every service has an open circuit.
+    """
+    tracker.calls += 1
+    queue = deque(tracker.ranked(services))
+    if not queue:
+        raise LookupError("no service available, all circuits are open")
+    if report is None:
+        report = RaceReport()
+    running = {}
+    last_error = None
+
+    def launch():
+        # claim the request (a recovering service's only probe) right before
+        # sending it, skipping services whose circuit has opened meanwhile
+        while queue:
+            service = queue.popleft()
+            if tracker.allow(service.name):
+                break
+        else:
+            return None
+        tracker.requests += 1
+        report.requests += 1
+        # each request counts the bytes it reads into its own ByteCount
+        count = ByteCount()
+        context = contextvars.copy_context()
+        context.run(received.set, count)
+        task = asyncio.create_task(fetch(service), context=context)
+        running[task] = (service, time.monotonic(), count)
+        return service
+
+    try:
+        service = launch()
+        while running:
+            delay = min(tracker.percentile(service.name, pct) or MAX_DELAY, MAX_DELAY)
+            done, _ = await asyncio.wait(
+                running,
+                timeout=delay if queue else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                done_service, started, count = running.pop(task)
+                if task.exception() is None:
+                    tracker.record(done_service.name, time.monotonic() - started)
+                    report.winner = done_service
+                    return done_service, task.result()
+                last_error = task.exception()
+                tracker.record_failure(done_service.name)
+                report._waste(started, count)
+
+            # slow or failed: hedge to the next best service
+            if queue:
+                service = launch() or service
+    finally:
+        cancelled_at = time.monotonic()
+        for task, (loser, started, _) in running.items():
+            if not task.done():
+                # a lower bound, so a slow service stops ranking as unknown
+                tracker.record_cancelled(loser.name, cancelled_at - started)
+            task.cancel()
+        if running:
+            _, still_running = await asyncio.wait(running, timeout=CLEANUP_TIMEOUT)
+            report.abandoned = len(still_running)
+        for task, (_, started, count) in running.items():
+            report._waste(started, count)
+            if task.done() and not task.cancelled():
+                task.exception()  # finished alongside the winner, mark retrieved
+
+    if last_error is None:
+        raise LookupError("no service available, all circuits are open")
+    raise last_error
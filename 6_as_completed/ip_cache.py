@@ -0,0 +1,90 @@
+"""
+TTL cache with stale-while-revalidate, persisted to a small JSON file.
+
+Our public IP almost never changes, so there is no reason to go to the
+network on every call:
+  * fresh entry (younger than `ttl`): returned straight from memory
+  * stale entry: returned straight away as well, and a single background
+    task refreshes it for the next caller
+  * no entry: the caller waits for the refresh (concurrent callers share it)
+
+Entries are written to `path` after every refresh so they survive restarts.
+A failed background refresh keeps serving the stale value.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Stale-while-revalidate cache for a handful of keys.
+
+    Args:
+        path (str): JSON file the entries are persisted to.
+        ttl (float): seconds an entry is considered fresh.
+    """
+
+    def __init__(self, path: str, ttl: float) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._entries: dict[str, dict] = self._load()
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    async def _refresh(self, key: str, fetch):
+        value = await fetch()
+        # wall clock, so the age is still right after a restart
+        self._entries[key] = {"value": value, "stored_at": time.time()}
+        self._save()
+        return value
+
+    def _start_refresh(self, key: str, fetch) -> asyncio.Task:
+        task = self._refreshing.get(key)
+        if task is None:
+            task = self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+            task.add_done_callback(lambda t: self._refresh_done(key, t))
+        return task
+
+    def _refresh_done(self, key: str, task: asyncio.Task) -> None:
+        self._refreshing.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("Refreshing %s failed: %r", key, task.exception())
+
+    async def get(self, key: str, fetch):
+        """Cached value for `key`, calling `fetch()` to fill or refresh it."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return await asyncio.shield(self._start_refresh(key, fetch))
+
+        if time.time() - entry["stored_at"] < self.ttl:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            self._start_refresh(key, fetch)
+        return entry["value"]
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Give background refreshes up to `timeout` seconds to finish."""
+        if self._refreshing:
+            await asyncio.wait(list(self._refreshing.values()), timeout=timeout)
@@ -0,0 +1,192 @@
+"""
+Service registry: rolling latency and error rate per service, plus a circuit
+breaker so dead endpoints stop costing us a connection timeout on every call.
+
+A breaker opens after `failure_threshold` consecutive failures. While open
+the service is left out of `ranked()` entirely. After `reset_timeout` seconds
+it goes half-open and lets a single probe request through every
+`reset_timeout` seconds; a success closes it again, a failure re-opens it.
+
+`ranked()` only looks at the breakers. The probe is claimed with `allow()`
+right before a request is actually sent, by `call()` or by `hedged()`.
+"""
+
+import time
+from collections import deque
+
+FAILURE_PENALTY = 10.0  # latency recorded for a failed request, sinks it in the ranking
+
+
+class LatencyTracker:
+    """Rolling window of request latencies per service, failures count as slow."""
+
+    def __init__(self, window: int = 100) -> None:
+        self.window = window
+        self._latencies: dict[str, deque[float]] = {}
+        self.calls = 0
+        self.requests = 0
+
+    def _sample(self, name: str, latency: float) -> None:
+        self._latencies.setdefault(name, deque(maxlen=self.window)).append(latency)
+
+    def record(self, name: str, latency: float) -> None:
+        self._sample(name, latency)
+
+    def record_failure(self, name: str) -> None:
+        self.record(name, FAILURE_PENALTY)
+
+    def record_cancelled(self, name: str, elapsed: float) -> None:
+        """A request given up on after `elapsed` seconds: at least that slow.
+
+        Only the latency is recorded, it counts as neither success nor failure.
+        """
+        self._sample(name, elapsed)
+
+    def percentile(self, name: str, pct: float) -> float | None:
+        samples = self._latencies.get(name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def ranked(self, services):
+        """`services` fastest first by median latency.
+
+        Services without any samples go first, in their given order, so each
+        one gets tried at least once.
+        """
+
+        def key(indexed):
+            index, service = indexed
+            median = self.percentile(service.name, 0.5)
+            return (median is not None, median or 0.0, index)
+
+        return [service for _, service in sorted(enumerate(services), key=key)]
+
+    def allow(self, name: str) -> bool:
+        """Claim the right to send a request to `name`; always granted here."""
+        return True
+
+    @property
+    def requests_per_call(self) -> float:
+        return self.requests / self.calls if self.calls else 0.0
+
+
+class CircuitOpenError(Exception):
+    """The service's circuit is open, no request was sent."""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open probe -> closed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 2, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._last_probe = 0.0
+
+    def available(self) -> bool:
+        """Whether `allow()` would let a request through now, without claiming it."""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self._opened_at < self.reset_timeout:
+            return False
+        return now - self._last_probe >= self.reset_timeout
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open this hands out the probe."""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if now - self._last_probe >= self.reset_timeout:
+            self._last_probe = now
+            return True
+        return False
+
+    def success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class ServiceRegistry(LatencyTracker):
+    """Latency ranking that skips services whose circuit is open."""
+
+    def __init__(
+        self, window: int = 100, failure_threshold: int = 2, reset_timeout: float = 30.0
+    ) -> None:
+        super().__init__(window)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._outcomes: dict[str, deque[bool]] = {}
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+        return breaker
+
+    def _outcome(self, name: str, ok: bool) -> None:
+        self._outcomes.setdefault(name, deque(maxlen=self.window)).append(ok)
+
+    def record(self, name: str, latency: float) -> None:
+        super().record(name, latency)
+        self._outcome(name, True)
+        self.breaker(name).success()
+
+    def record_failure(self, name: str) -> None:
+        super().record(name, FAILURE_PENALTY)
+        self._outcome(name, False)
+        self.breaker(name).failure()
+
+    def error_rate(self, name: str) -> float:
+        outcomes = self._outcomes.get(name)
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def ranked(self, services):
+        """Services in latency order, leaving out the ones with an open circuit."""
+        return [s for s in super().ranked(services) if self.breaker(s.name).available()]
+
+    def allow(self, name: str) -> bool:
+        return self.breaker(name).allow()
+
+    async def call(self, service, fetch):
+        """Await `fetch()` on behalf of `service`, recording latency or failure.
+
+        Raises:
+            CircuitOpenError: the circuit is open, or its probe is taken.
+        """
+        if not self.allow(service.name):
+            raise CircuitOpenError(service.name)
+        start = time.monotonic()
+        try:
+            result = await fetch()
+        except Exception:
+            self.record_failure(service.name)
+            raise
+        self.record(service.name, time.monotonic() - start)
+        return result
+
+
+registry = ServiceRegistry()
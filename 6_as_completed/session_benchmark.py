@@ -0,0 +1,72 @@
+"""
+Latency of a session per call versus the shared `SessionProvider` session.
+
+    python session_benchmark.py [url ...]
+
+For each URL, prints the first-call latency and the median of the following
+calls, once creating a new ClientSession per call (what the examples used to
+do), once through the shared provider, and once fetching only the headers
+through `aiohttp_get_headers`.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import aiohttp
+
+from sessions import SessionProvider, aiohttp_get_headers
+from sessions import provider as default_provider
+
+URLS = ("https://api.ipify.org?format=json", "http://ip-api.com/json")
+CALLS = 20
+
+
+async def per_call_session(url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return await response.json()
+
+
+def shared_session(provider):
+    async def get_json(url):
+        session = await provider.get()
+        async with session.get(url) as response:
+            return await response.json()
+
+    return get_json
+
+
+async def measure(get_json, url):
+    timings = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        await get_json(url)
+        timings.append(time.perf_counter() - start)
+    return timings[0], statistics.median(timings[1:])
+
+
+async def main(urls):
+    print(f"{CALLS} sequential calls per URL")
+    print(f"{'url':<40} {'mode':<12} {'first (ms)':>10} {'steady (ms)':>11}")
+    for url in urls:
+        first, steady = await measure(per_call_session, url)
+        print(f"{url:<40} {'per-call':<12} {first * 1000:>10.1f} {steady * 1000:>11.1f}")
+
+        provider = SessionProvider()
+        try:
+            first, steady = await measure(shared_session(provider), url)
+        finally:
+            await provider.close()
+        print(f"{url:<40} {'shared':<12} {first * 1000:>10.1f} {steady * 1000:>11.1f}")
+
+        try:
+            first, steady = await measure(aiohttp_get_headers, url)
+        finally:
+            await default_provider.close()
+        print(f"{url:<40} {'headers':<12} {first * 1000:>10.1f} {steady * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:] or URLS))
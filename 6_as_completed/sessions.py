@@ -0,0 +1,115 @@
+"""
+One `aiohttp.ClientSession` shared by every service lookup in the process.
+
+Creating a session per request means a new connector each time: a fresh DNS
+lookup, TCP connect and TLS handshake before the first byte is sent. The
+provider creates the session once, lazily, and keeps its connection pool
+alive until shutdown.
+
+    async with provider:
+        await aiohttp_get_json(url)   # reuses pooled keep-alive connections
+
+`aiohttp_get_headers` is for probes that only look at the response headers.
+It sends a HEAD request. If an origin answers HEAD with 405 or 501, the
+origin is remembered in `head_unsupported` and from then on gets a GET that
+is closed as soon as the headers have arrived, so the body is never read.
+
+Response body bytes read by these helpers are added to the `ByteCount` in
+`received`, if the current task has one set, chunk by chunk as they arrive.
+This lets a race charge each competing request for what it downloaded, even
+a loser cancelled halfway through its body.
+"""
+
+import json
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+class SessionProvider:
+    """Lazily created, process-wide `ClientSession` with lifecycle hooks.
+
+    Hooks are coroutine functions taking the session: `on_startup` ones run
+    right after it is created, `on_shutdown` ones right before it is closed.
+    """
+
+    def __init__(self, **session_kwargs) -> None:
+        self._session_kwargs = session_kwargs
+        self._session: aiohttp.ClientSession | None = None
+        self.on_startup = []
+        self.on_shutdown = []
+
+    async def get(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(**self._session_kwargs)
+            for hook in self.on_startup:
+                await hook(self._session)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is None or self._session.closed:
+            return
+        for hook in self.on_shutdown:
+            await hook(self._session)
+        await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> aiohttp.ClientSession:
+        return await self.get()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class ByteCount:
+    __slots__ = ("bytes",)
+
+    def __init__(self) -> None:
+        self.bytes = 0
+
+
+received: ContextVar[ByteCount | None] = ContextVar("received", default=None)
+
+
+provider = SessionProvider()
+
+# origins that refuse HEAD; may be pre-filled for endpoints known to do so
+head_unsupported: set[str] = set()
+
+
+async def read_counted(response: aiohttp.ClientResponse) -> bytes:
+    """Read the whole body, adding each chunk to `received` as it arrives.
+
+    aiohttp's chunk trace only fires once `read()` has the entire body, so a
+    request cancelled mid-download would be charged nothing.
+    """
+    count = received.get()
+    chunks = []
+    async for chunk in response.content.iter_any():
+        if count is not None:
+            count.bytes += len(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def aiohttp_get_json(url):
+    session = await provider.get()
+    async with session.get(url) as response:
+        return json.loads(await read_counted(response))
+
+
+async def aiohttp_get_headers(url):
+    session = await provider.get()
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    if origin not in head_unsupported:
+        async with session.head(url) as response:
+            if response.status not in (405, 501):
+                return response.headers
+        head_unsupported.add(origin)
+
+    response = await session.get(url)
+    # the headers are in, drop the connection instead of reading the body
+    response.close()
+    return response.headers
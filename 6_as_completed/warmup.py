@@ -0,0 +1,95 @@
+"""
+Connection pre-warming for the shared session.
+
+The first request to a host pays for DNS resolution, the TCP connect and the
+TLS handshake, which is most of what the "took: X seconds" lines in these
+examples measure. Warming sends a cheap HEAD request to every host's origin
+as soon as the session is created, so by the time the first real request
+goes out the address is in the connector's DNS cache and a keep-alive
+connection is sitting in the pool.
+
+Idle keep-alive connections are closed by aiohttp after 15 seconds (and
+cached DNS entries expire after 10), so with `keep_warm` set the hosts are
+touched again every `keep_warm` seconds until the session is closed.
+
+    warm_up(provider, [service.url for service in SERVICES])
+"""
+
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+KEEP_WARM = 10.0  # seconds, below aiohttp's default 15s keep-alive timeout
+
+
+class Warmer:
+    """Opens and keeps open one connection per origin of `urls`.
+
+    Args:
+        urls: URLs whose hosts should be warmed; duplicates are warmed once.
+        keep_warm (float | None): seconds between re-warms, None to warm once.
+    """
+
+    def __init__(self, urls, keep_warm: float | None = KEEP_WARM) -> None:
+        origins = []
+        for url in urls:
+            parts = urlsplit(url)
+            origin = f"{parts.scheme}://{parts.netloc}/"
+            if origin not in origins:
+                origins.append(origin)
+        self.origins = origins
+        self.keep_warm = keep_warm
+        self.timings: dict[str, float] = {}  # origin -> first warm-up seconds
+        self.failures: dict[str, BaseException] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _touch(self, session, origin: str) -> None:
+        start = time.perf_counter()
+        try:
+            # any status will do, we only want the connection in the pool
+            async with session.head(origin, allow_redirects=False) as response:
+                await response.release()
+        except Exception as e:
+            self.failures[origin] = e
+            return
+        self.failures.pop(origin, None)
+        self.timings.setdefault(origin, time.perf_counter() - start)
+
+    async def warm(self, session) -> None:
+        await asyncio.gather(*(self._touch(session, origin) for origin in self.origins))
+
+    async def _keep_warm(self, session) -> None:
+        while True:
+            await asyncio.sleep(self.keep_warm)
+            await self.warm(session)
+
+    async def start(self, session) -> None:
+        """`on_startup` hook: warm every origin, then keep them warm."""
+        await self.warm(session)
+        if self.keep_warm:
+            self._task = asyncio.create_task(self._keep_warm(session))
+
+    async def stop(self, session) -> None:
+        """`on_shutdown` hook: stop the keep-warm loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> None:
+        for origin in self.origins:
+            if origin in self.failures:
+                print(f"warm-up {origin} failed: {self.failures[origin]!r}")
+            elif origin in self.timings:
+                print(f"warm-up {origin} took {self.timings[origin] * 1000:.1f} ms")
+
+
+def warm_up(provider, urls, keep_warm: float | None = KEEP_WARM) -> Warmer:
+    """Warm the hosts of `urls` whenever `provider` creates its session."""
+    warmer = Warmer(urls, keep_warm)
+    provider.on_startup.append(warmer.start)
+    provider.on_shutdown.append(warmer.stop)
+    return warmer
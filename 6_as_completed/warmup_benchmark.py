@@ -0,0 +1,70 @@
+"""
+First-request latency with and without connection pre-warming.
+
+    python warmup_benchmark.py [url ...]
+
+For each URL a fresh `SessionProvider` is used twice: once cold, timing the
+first GET, and once warmed, timing the warm-up itself and then the first GET.
+The warm-up happens at startup, off the path of the first real request.
+"""
+
+import asyncio
+import sys
+import time
+
+from sessions import SessionProvider
+from warmup import warm_up
+
+URLS = (
+    "https://api.ipify.org?format=json",
+    "http://ip-api.com/json",
+    "https://api.github.com/events",
+    "https://hacker-news.firebaseio.com/v0/topstories.json",
+)
+
+
+async def first_get(provider, url):
+    session = await provider.get()
+    start = time.perf_counter()
+    async with session.get(url) as response:
+        await response.read()
+    return time.perf_counter() - start
+
+
+async def cold(url):
+    provider = SessionProvider()
+    try:
+        return await first_get(provider, url)
+    finally:
+        await provider.close()
+
+
+async def warm(url):
+    provider = SessionProvider()
+    warm_up(provider, [url], keep_warm=None)
+    try:
+        start = time.perf_counter()
+        await provider.get()  # runs the warm-up hook
+        warm_up_time = time.perf_counter() - start
+        return warm_up_time, await first_get(provider, url)
+    finally:
+        await provider.close()
+
+
+async def main(urls):
+    print(f"{'url':<56} {'cold (ms)':>10} {'warm-up (ms)':>12} {'warm (ms)':>10}")
+    for url in urls:
+        try:
+            cold_time = await cold(url)
+            warm_up_time, warm_time = await warm(url)
+        except Exception as e:
+            print(f"{url:<56} failed: {e!r}")
+            continue
+        print(
+            f"{url:<56} {cold_time * 1000:>10.1f} {warm_up_time * 1000:>12.1f}"
+            f" {warm_time * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:] or URLS))
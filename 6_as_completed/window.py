@@ -0,0 +1,86 @@
+"""
+`asyncio.as_completed` for more awaitables than fit in memory at once.
+
+`asyncio.as_completed(aws)` turns every awaitable into a task up front, so
+100k clients means 100k coroutines, tasks and sockets all at the same time.
+`CompletionWindow` pulls awaitables from a (possibly lazy) iterable and keeps
+at most `size` of them running. A new one is only started when the consumer
+has taken a finished one, which also keeps the consumer from falling behind.
+
+    window = CompletionWindow((fetch(i) for i in range(100_000)), size=100)
+    async for task in window:
+        result = await task   # returns the result or raises, like as_completed
+    print(f"{window.rate:.1f} per second")
+"""
+
+import asyncio
+import time
+
+
+class CompletionWindow:
+    """Async iterator over finished tasks, at most `size` in flight.
+
+    Args:
+        aws: iterable of awaitables, consumed lazily.
+        size (int): maximum number of awaitables running at once.
+        timeout (float | None): per-item timeout; an item that takes longer
+            is cancelled and its task raises `TimeoutError`.
+    """
+
+    def __init__(self, aws, size: int, timeout: float | None = None) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._aws = aws
+        self.size = size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._started_at: float | None = None
+
+    def _start(self, aw) -> asyncio.Future:
+        if self.timeout is not None:
+            aw = asyncio.wait_for(aw, self.timeout)
+        return asyncio.ensure_future(aw)
+
+    async def __aiter__(self):
+        aws = iter(self._aws)
+        pending = set()
+        exhausted = False
+        self._started_at = time.monotonic()
+        try:
+            while True:
+                while not exhausted and len(pending) < self.size:
+                    try:
+                        pending.add(self._start(next(aws)))
+                    except StopIteration:
+                        exhausted = True
+                self.in_flight = len(pending)
+                if not pending:
+                    return
+
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    self.completed += 1
+                    if task.cancelled() or task.exception() is not None:
+                        self.failed += 1
+                    yield task
+        finally:
+            # the consumer stopped early or was cancelled
+            for task in pending:
+                task.cancel()
+            self.in_flight = 0
+
+    @property
+    def elapsed(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        return time.monotonic() - self._started_at
+
+    @property
+    def rate(self) -> float:
+        """Completed items per second so far."""
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed else 0.0
@@ -0,0 +1,101 @@
+"""
+Detect tasks that swallow cancellation.
+
+A coroutine that catches `asyncio.CancelledError` and returns normally (like
+`func_b` in 3_exception_handling_basics/exception_tasks.py) makes
+`task.cancel()` a no-op: `gather` doesn't get cancelled, shutdown waits for
+work that was supposed to stop.
+
+`CancelWatch` installs a task factory so every task records when it was
+first asked to cancel. When the task finishes it is flagged if it did not end
+up cancelled, and the time it took to settle after `cancel()` is recorded, so
+we know how long a shutdown can really take.
+
+Cancellations that are taken back with `Task.uncancel()` (what
+`asyncio.timeout()` does when it turns a cancel into TimeoutError) are not
+flagged.
+"""
+
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class WatchedTask(asyncio.Task):
+    """Task that reports its cancel requests to a `CancelWatch`."""
+
+    def __init__(self, coro, *, watch: "CancelWatch", **kwargs) -> None:
+        super().__init__(coro, **kwargs)
+        self._watch = watch
+        self.cancel_requested_at = None
+        self.add_done_callback(watch._settled)
+
+    def cancel(self, msg=None) -> bool:
+        if self.cancel_requested_at is None and not self.done():
+            self.cancel_requested_at = time.monotonic()
+        return super().cancel(msg)
+
+    def uncancel(self) -> int:
+        remaining = super().uncancel()
+        if remaining == 0:
+            self.cancel_requested_at = None
+        return remaining
+
+
+class CancelWatch:
+    """Tracks cancel requests per task and flags the ones that swallow them."""
+
+    def __init__(self) -> None:
+        self.cancelled = 0
+        self.settle_times: list[float] = []
+        self.swallowed: list[tuple[str, str, float]] = []
+
+    def install(self, loop: asyncio.AbstractEventLoop | None = None) -> "CancelWatch":
+        loop = loop or asyncio.get_running_loop()
+        loop.set_task_factory(
+            lambda loop, coro, **kwargs: WatchedTask(
+                coro, loop=loop, watch=self, **kwargs
+            )
+        )
+        return self
+
+    @classmethod
+    def install_if_debug(cls) -> "CancelWatch | None":
+        """Install only when asyncio debug mode is on (PYTHONASYNCIODEBUG=1)."""
+        if asyncio.get_running_loop().get_debug():
+            return cls().install()
+        return None
+
+    def _settled(self, task: WatchedTask) -> None:
+        if task.cancel_requested_at is None:
+            return
+        settle = time.monotonic() - task.cancel_requested_at
+        self.cancelled += 1
+        self.settle_times.append(settle)
+        if not task.cancelled():
+            coro = task.get_coro()
+            name = getattr(coro, "__qualname__", repr(coro))
+            self.swallowed.append((task.get_name(), name, settle))
+            log.warning(
+                "%s (%s) was cancelled but finished without raising CancelledError",
+                task.get_name(),
+                name,
+            )
+
+    @property
+    def worst_settle_time(self) -> float:
+        return max(self.settle_times, default=0.0)
+
+    def report(self) -> None:
+        avg = sum(self.settle_times) / len(self.settle_times) if self.settle_times else 0
+        print(
+            f"Cancel watch: {self.cancelled} tasks cancelled, "
+            f"settled in avg {avg * 1000:.1f} ms / worst {self.worst_settle_time * 1000:.1f} ms"
+        )
+        for task_name, coro_name, settle in self.swallowed:
+            print(
+                f"  {task_name} ({coro_name}) swallowed CancelledError, "
+                f"settled after {settle * 1000:.1f} ms"
+            )
@@ -1,11 +1,49 @@
 import asyncio
+import functools
 import logging
+import os
 import random
 import signal
 import string
-import uuid
+import sys
 
-import attr
+# cancel_watch.py is shared from the repo root
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+)
+
+from ack_batcher import AckBatcher
+from bounded_queue import BLOCK, BoundedQueue, report_gauges
+from cancel_watch import CancelWatch
+from lease_manager import LeaseManager
+from message import PubSubMessage, new_message_id
+from restart_coalescer import RestartCoalescer
+from store import WriteBehindStore
+from worker_pool import WorkerPool
+
+# upper bound on how long shutdown waits for cancelled tasks to settle
+SHUTDOWN_TIMEOUT = 5
+# most messages waiting for a consumer, and what to do when there are more:
+# block, drop_oldest, drop_newest or shed_priority
+QUEUE_SIZE = 100
+QUEUE_POLICY = BLOCK
+# consumer workers, and most messages being handled at once across them;
+# a worker runs several handlers at once when this is above WORKERS
+WORKERS = 10
+MAX_IN_FLIGHT = 50
+# acks are sent once this many are pending or the oldest is this old (seconds)
+ACK_BATCH = 100
+ACK_DELAY = 0.05
+# local message store, written in batches of up to STORE_BATCH rows with at
+# most STORE_BUFFER rows not yet written. Handlers wait for their save, so no
+# more than MAX_IN_FLIGHT rows are ever buffered; a batch is written as soon
+# as the previous one is done rather than held open for STORE_INTERVAL.
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "messages.db")
+STORE_BUFFER = MAX_IN_FLIGHT
+STORE_BATCH = MAX_IN_FLIGHT
+STORE_INTERVAL = None
+# messages for a host within this many seconds share a single restart
+RESTART_WINDOW = 0.5
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,34 +52,25 @@ logging.basicConfig(
 )
 
 
-@attr.s
-class PubSubMessage:
-    instance_name = attr.ib()
-    message_id = attr.ib(repr=False)
-    hostname = attr.ib(repr=False, init=False)
-    restarted = attr.ib(repr=False, default=False)
-    saved = attr.ib(repr=False, default=False)
-    acked = attr.ib(repr=False, default=False)
-    extended_cnt = attr.ib(repr=False, default=0)
-
-    def __attrs_post_init__(self):
-        self.hostname = f"{self.instance_name}.example.net"
-
-
 async def publish(queue):
     """Simulates an external publisher of messages.
 
     Args:
-        queue (asyncio.Queue): Queue to publish messages to.
+        queue (BoundedQueue): Queue to publish messages to; depending on
+            its policy a full queue blocks here or drops a message.
     """
     choices = string.ascii_lowercase + string.digits
 
     while True:
-        msg_id = str(uuid.uuid4())
+        msg_id = new_message_id()
         host_id = "".join(random.choices(choices, k=4))
         isinstance_name = f"cattle-{host_id}"
-        msg = PubSubMessage(message_id=msg_id, instance_name=isinstance_name)
-        asyncio.create_task(queue.put(msg))
+        msg = PubSubMessage(
+            message_id=msg_id,
+            instance_name=isinstance_name,
+            priority=random.randint(0, 2),
+        )
+        await queue.put(msg)
         logging.debug(f"published message {msg}")
         await asyncio.sleep(random.random())
 
@@ -58,72 +87,79 @@ async def restart_host(msg):
     logging.info(f"Restarted {msg.hostname}")
 
 
-async def save(msg):
+async def save(msg, store):
     """Save message to a database.
 
     Args:
         msg (PubSubMessage): consumed event message to be saved.
+        store (WriteBehindStore): returns once the message is committed,
+            so it is always on disk before it gets acked.
     """
-    await asyncio.sleep(random.random())
-    msg.save = True
+    await store.save(msg)
+    msg.saved = True
     logging.info(f"saved {msg} into database")
 
 
-async def cleanup(msg):
-    """Cleanup tasks related to completing work on a message.
+async def send_acks(msgs):
+    """Acknowledge a batch of messages with the broker.
 
     Args:
-        msg (PubSubMessage): consumed event message that is done being
-            processed.
+        msgs (list): PubSubMessages to ack in a single round trip.
     """
     await asyncio.sleep(random.random())
-    msg.acked = True
-    logging.info(f"Done. Acked {msg}")
+    logging.info(f"Acked a batch of {len(msgs)} messages")
 
 
-async def extend(msg, event):
-    """Periodically extend the message acknowledgement deadline.
+async def cleanup(msg, acks):
+    """Cleanup tasks related to completing work on a message.
 
     Args:
-        msg (PubSubMessage): consumed event message to extend.
-        event (asyncio.Event): event to watch for message extention or
-            cleaning up.
+        msg (PubSubMessage): consumed event message that is done being
+            processed.
+        acks (AckBatcher): batcher that sends the ack and sets `msg.acked`.
     """
-    while not event.is_set():
-        msg.extended_cnt += 1
-        logging.info(f"Extend deadline by 3 seconds for {msg}")
-        await asyncio.sleep(2)
-
-    else:
-        await cleanup(msg)
+    await acks.ack(msg)
+    logging.info(f"Done. Acked {msg}")
 
 
-async def handle_message(msg):
+async def handle_message(msg, leases, store, restarts):
     """Kick off tasks for a given message.
 
     Args:
         msg (PubSubMessage): consumed message to process.
+        leases (LeaseManager): keeps extending the message's ack deadline
+            while it is processed, and acks it once it is done.
+        store (WriteBehindStore): store to save the message to.
+        restarts (RestartCoalescer): restarts the message's host, once for
+            all messages naming it in a burst.
     """
-    event = asyncio.Event()
-    t = asyncio.create_task(extend(msg, event))
-    all_t = await asyncio.gather(save(msg), restart_host(msg))
-    event.set()
+    logging.info(f"Consumed {msg}")
+    leases.add(msg)
+    try:
+        await asyncio.gather(save(msg, store), restarts.restart(msg))
+    except Exception:
+        leases.drop(msg)
+        raise
+    leases.complete(msg)
 
 
-async def consume(queue):
+async def consume(pool):
     """Consumer client to simulate subscribing to a publisher.
 
     Args:
-        queue (asyncio.Queue): Queue from which to consume messages.
+        pool (WorkerPool): workers consuming from the pool's queue; a message
+            is only taken off the queue once a worker has a free slot for it.
     """
-    while True:
-        msg = await queue.get()
-        logging.info(f"Consumed {msg}")
-        handle_task = asyncio.create_task(handle_message(msg))
+    await pool.run()
+
 
+async def shutdown(watch=None):
+    """Cleanup tasks tied to the service's shutdown.
 
-async def shutdown():
-    """Cleanup tasks tied to the service's shutdown."""
+    Args:
+        watch (CancelWatch): if given, report tasks that swallowed their
+            cancellation and how long tasks took to settle.
+    """
 
     logging.info("Closing database connections")
     logging.info("Nacking outstanding messages")
@@ -132,25 +168,62 @@ async def shutdown():
     [task.cancel() for task in tasks]
 
     logging.info(f"Cancelling {len(tasks)} outstanding tasks")
-    await asyncio.gather(*tasks, return_exceptions=True)
+    if tasks:
+        # bounded, so a task that ignores cancel() can't hold up shutdown
+        done, pending = await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT)
+        for task in done:
+            if not task.cancelled():
+                task.exception()  # mark as retrieved, like return_exceptions=True
+        if pending:
+            logging.warning(
+                f"{len(pending)} tasks still running {SHUTDOWN_TIMEOUT}s after cancel"
+            )
+    if watch is not None:
+        watch.report()
     logging.info("Flushing metrics")
 
 
 async def main():
-    queue = asyncio.Queue()
+    # run with PYTHONASYNCIODEBUG=1 to flag handlers that swallow cancellation
+    watch = CancelWatch.install_if_debug()
+    queue = BoundedQueue(QUEUE_SIZE, QUEUE_POLICY, priority=lambda msg: msg.priority)
+    acks = AckBatcher(send_acks, ACK_BATCH, ACK_DELAY)
+    leases = LeaseManager(functools.partial(cleanup, acks=acks))
+    store = WriteBehindStore(DB_PATH, STORE_BUFFER, STORE_BATCH, STORE_INTERVAL)
+    restarts = RestartCoalescer(restart_host, RESTART_WINDOW)
+    handler = functools.partial(
+        handle_message, leases=leases, store=store, restarts=restarts
+    )
+    pool = WorkerPool(queue, handler, WORKERS, MAX_IN_FLIGHT)
 
     try:
         # pub_task = loop.create_task(publish(queue))
         # sub_taks = loop.create_task(consume(queue))
         # loop.run_forever()
         results = await asyncio.gather(
-            publish(queue), consume(queue), return_exceptions=True
+            publish(queue),
+            consume(pool),
+            acks.run(),
+            leases.run(),
+            store.run(),
+            report_gauges(queue),
+            return_exceptions=True,
         )
     except KeyboardInterrupt:
         logging.info("Process started")
         logging.info("successfully shutdown the Mayhem system")
     finally:
-        await shutdown()
+        logging.info(f"queue gauges: {queue.gauges()}")
+        pool.log_utilization()
+        leases.log_stats()
+        restarts.log_stats()
+        # commit buffered messages before sending the acks gathered so far,
+        # the rest get nacked on shutdown
+        await store.close()
+        store.log_stats()
+        await acks.close()
+        acks.log_stats()
+        await shutdown(watch)
 
 
 if __name__ == "__main__":
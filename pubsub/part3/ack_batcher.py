@@ -0,0 +1,54 @@
+"""
+Batched message acknowledgements.
+
+Acking every message on its own costs one broker round trip per message,
+which dominates once messages arrive faster than a few per round trip.
+`AckBatcher` collects acks and sends them in one call when `max_batch` are
+pending or the oldest one has waited `max_delay` seconds, whichever comes
+first.
+
+`msg.acked` is only set once the batch containing it has been sent
+successfully, and `ack()` only returns then. A failed send is logged and
+its messages are retried with the next batch (see batch_flusher.py).
+"""
+
+import logging
+
+from batch_flusher import BatchFlusher
+
+
+class AckBatcher(BatchFlusher):
+    """Send acks in batches of up to `max_batch`, at most `max_delay` late.
+
+    Args:
+        send (coroutine function): called with a list of messages, acks
+            them with the broker in one round trip; raises on failure.
+        max_batch (int): pending acks that trigger a flush right away.
+        max_delay (float): seconds the oldest pending ack may wait.
+    """
+
+    action = "Acking"
+    noun = "messages"
+
+    def __init__(self, send, max_batch=100, max_delay=0.05):
+        super().__init__(max_batch, max_delay)
+        self._send = send
+
+    async def ack(self, msg):
+        """Queue `msg` for acking and wait until its batch has been sent."""
+        await self.submit(msg)
+
+    async def _write(self, msgs):
+        await self._send(msgs)
+
+    def _written(self, msgs):
+        for msg in msgs:
+            msg.acked = True
+
+    def stats(self):
+        stats = super().stats()
+        stats["acked"] = stats.pop("written")
+        return stats
+
+    def log_stats(self):
+        logging.info(f"acks: {self.stats()}")
@@ -0,0 +1,169 @@
+"""
+Count-or-age batching, shared by `AckBatcher` and `WriteBehindStore`.
+
+Items handed to `submit()` are written together by `_write()`: a batch goes
+out once `max_batch` items are pending or the oldest has waited `max_delay`
+seconds, whichever comes first. With `max_delay=None` a batch goes out as
+soon as the previous one is done, so items only pile up while a write is in
+progress.
+
+`submit()` only returns once the batch holding its item has been written. A
+failed write is logged and its items are retried with the next batch. A
+write runs in its own shielded task, so cancelling `run()` (as shutdown
+does) never drops a batch halfway; `close()` waits for that write to finish
+before flushing what is left.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+
+class BatchFlusher:
+    """Write submitted items in batches of up to `max_batch`.
+
+    Subclasses implement `_write(items)`, which raises on failure, and may
+    override `_written(items)` to act on items once their batch is written.
+    `_write` may also return `{index: exception}` for single items it
+    refused; their `submit()` raises that exception, the rest succeed.
+
+    Args:
+        max_batch (int): pending items that trigger a flush right away.
+        max_delay (float): seconds the oldest pending item may wait, or
+            None to flush whenever the previous batch is done.
+    """
+
+    # "<action> <n> <noun> failed, will retry" when a write raises
+    action = "Writing"
+    noun = "items"
+
+    def __init__(self, max_batch, max_delay=None):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []  # (item, queued_at, future)
+        self._has_pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flushing = asyncio.Lock()
+        self._writing = None  # task writing the current batch
+        self.batches = 0
+        self.written = 0
+        self.failed_flushes = 0
+        self.rejected = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self.latencies = deque(maxlen=1000)
+
+    def _update_events(self):
+        if self._pending:
+            self._has_pending.set()
+        else:
+            self._has_pending.clear()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        else:
+            self._full.clear()
+
+    async def submit(self, item):
+        """Queue `item` and wait until its batch has been written."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, time.monotonic(), future))
+        self._update_events()
+        await future
+
+    async def _write(self, items):
+        raise NotImplementedError
+
+    def _written(self, items):
+        pass
+
+    async def flush(self):
+        """Write up to `max_batch` pending items; returns False if that failed."""
+        async with self._flushing:
+            if self._writing is not None and not self._writing.done():
+                # a cancelled flush left its write running, let it finish first
+                await asyncio.wait([self._writing])
+
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            self._update_events()
+            if not batch:
+                return True
+
+            # shielded, so cancelling the flush doesn't lose the batch
+            self._writing = asyncio.create_task(self._write_batch(batch))
+            return await asyncio.shield(self._writing)
+
+    async def _write_batch(self, batch):
+        items = [item for item, _, _ in batch]
+        try:
+            rejected = await self._write(items) or {}
+        except Exception as e:
+            self.failed_flushes += 1
+            logging.error(
+                f"{self.action} {len(batch)} {self.noun} failed, will retry: {e!r}"
+            )
+            self._pending[:0] = batch
+            self._update_events()
+            return False
+        except asyncio.CancelledError:
+            # the write itself was cancelled: keep the items for close()
+            self._pending[:0] = batch
+            self._update_events()
+            raise
+
+        self._written([item for i, item in enumerate(items) if i not in rejected])
+        now = time.monotonic()
+        for i, (_, queued_at, future) in enumerate(batch):
+            self.latencies.append(now - queued_at)
+            if future.done():
+                continue
+            if i in rejected:
+                future.set_exception(rejected[i])
+            else:
+                future.set_result(None)
+        self.batches += 1
+        self.written += len(batch) - len(rejected)
+        self.rejected += len(rejected)
+        self.batch_sizes.append(len(batch))
+        return True
+
+    async def run(self):
+        """Flush on a full batch or an old enough item, until cancelled."""
+        while True:
+            await self._has_pending.wait()
+            if self.max_delay is not None:
+                waited = time.monotonic() - self._pending[0][1]
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay - waited)
+                except asyncio.TimeoutError:
+                    pass
+            if not await self.flush():
+                # don't hammer a failing backend
+                await asyncio.sleep(self.max_delay or 0.1)
+
+    async def close(self):
+        """Wait for a write in progress, then flush everything still pending,
+        stopping at the first failure."""
+        while await self.flush() and self._pending:
+            pass
+
+    def stats(self):
+        sizes = self.batch_sizes
+        latencies = sorted(self.latencies)
+
+        def latency_ms(pct):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * pct))] * 1000
+
+        return {
+            "batches": self.batches,
+            "written": self.written,
+            "pending": len(self._pending),
+            "failed_flushes": self.failed_flushes,
+            "rejected": self.rejected,
+            "mean_batch": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+            "max_batch": max(sizes, default=0),
+            "p50_ms": round(latency_ms(0.5), 1),
+            "p99_ms": round(latency_ms(0.99), 1),
+        }
@@ -0,0 +1,124 @@
+"""
+Bounded message queue with a choice of what to do when it is full.
+
+`asyncio.create_task(queue.put(msg))` against an unbounded `asyncio.Queue`
+never pushes back on the publisher: when consumers fall behind, the queue
+and the pile of pending put-tasks grow until we run out of memory. This
+queue holds at most `maxsize` messages and applies one of these policies
+when a message arrives while it is full:
+
+  * BLOCK: the publisher waits for room (backpressure)
+  * DROP_OLDEST: the longest-waiting message is dropped to make room
+  * DROP_NEWEST: the incoming message is dropped
+  * SHED_PRIORITY: the lowest-priority message, queued or incoming, is
+    dropped; among equals the newest goes
+
+Depth, drops and time publishers spent blocked are kept as gauges.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+SHED_PRIORITY = "shed_priority"
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, SHED_PRIORITY)
+
+
+class BoundedQueue(asyncio.Queue):
+    """`asyncio.Queue` whose `put` applies an overload policy.
+
+    Args:
+        maxsize (int): most messages held at once, must be positive.
+        policy (str): one of `POLICIES`.
+        priority (callable): message -> number, higher is more important.
+            Only used by SHED_PRIORITY.
+    """
+
+    def __init__(self, maxsize, policy=BLOCK, priority=None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        if policy == SHED_PRIORITY and priority is None:
+            raise ValueError(f"{SHED_PRIORITY} needs a priority function")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.priority = priority
+        self.max_depth = 0
+        self.dropped = 0
+        self.blocked_puts = 0
+        self.blocked_time = 0.0
+
+    # asyncio.Queue storage hooks, as overridden by LifoQueue/PriorityQueue
+    def _init(self, maxsize):
+        self._queue = deque()
+
+    def _put(self, item):
+        self._queue.append(item)
+        self.max_depth = max(self.max_depth, len(self._queue))
+
+    def _get(self):
+        return self._queue.popleft()
+
+    def _drop(self, item):
+        self.dropped += 1
+        logging.debug(f"queue full, dropped {item}")
+
+    def _evict(self, item):
+        """Drop a queued `item`, keeping `join()` bookkeeping right."""
+        self._queue.remove(item)
+        self.task_done()
+        self._drop(item)
+
+    def put_nowait(self, item):
+        if not self.full() or self.policy == BLOCK:
+            # BLOCK raises QueueFull here, like asyncio.Queue
+            return super().put_nowait(item)
+
+        if self.policy == DROP_NEWEST:
+            return self._drop(item)
+        if self.policy == DROP_OLDEST:
+            self._evict(self._queue[0])
+        else:
+            # reversed, so the newest of equally unimportant messages goes
+            victim = min(reversed(self._queue), key=self.priority)
+            if self.priority(victim) >= self.priority(item):
+                return self._drop(item)
+            self._evict(victim)
+        super().put_nowait(item)
+
+    async def put(self, item):
+        if self.policy != BLOCK or not self.full():
+            return self.put_nowait(item)
+
+        self.blocked_puts += 1
+        start = time.monotonic()
+        try:
+            await super().put(item)
+        finally:
+            self.blocked_time += time.monotonic() - start
+
+    def gauges(self):
+        return {
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "blocked_puts": self.blocked_puts,
+            "blocked_time": round(self.blocked_time, 3),
+        }
+
+
+async def report_gauges(queue, interval=10):
+    """Log the queue gauges every `interval` seconds.
+
+    Args:
+        queue (BoundedQueue): queue to report on.
+        interval (float): seconds between reports.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        logging.info(f"queue ({queue.policy}): {queue.gauges()}")
@@ -0,0 +1,89 @@
+"""
+CPU and memory of keeping 100k messages' leases extended.
+
+    python lease_benchmark.py [messages]
+
+Compares one `extend()`-style task per message against a single
+`LeaseManager`. Both extend every lease every `INTERVAL` seconds (shorter
+than the real 2s so the run stays short); the table shows the memory
+allocated to hold the leases, the CPU time spent over `DURATION` seconds
+and the number of extensions done in that time.
+"""
+
+import asyncio
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+
+from lease_manager import LeaseManager
+
+MESSAGES = 100_000
+INTERVAL = 0.5
+DURATION = 3
+
+
+class Msg:
+    __slots__ = ("extended_cnt",)
+
+    def __init__(self):
+        self.extended_cnt = 0
+
+
+async def extend(msg, event):
+    # the old per-message loop, minus the logging
+    while not event.is_set():
+        msg.extended_cnt += 1
+        await asyncio.sleep(INTERVAL)
+
+
+async def per_message_tasks(msgs):
+    event = asyncio.Event()
+    tasks = [asyncio.create_task(extend(msg, event)) for msg in msgs]
+    await asyncio.sleep(0)  # let every task start and arm its timer
+    return tasks
+
+
+async def lease_manager(msgs):
+    async def on_done(msg):
+        pass
+
+    leases = LeaseManager(on_done, interval=INTERVAL)
+    for msg in msgs:
+        leases.add(msg)
+    return [asyncio.create_task(leases.run())]
+
+
+async def measure(name, start):
+    msgs = [Msg() for _ in range(MESSAGES)]
+    gc.collect()
+    tracemalloc.start()
+    tasks = await start(msgs)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    before = sum(msg.extended_cnt for msg in msgs)
+    cpu = time.process_time()
+    await asyncio.sleep(DURATION)
+    cpu = time.process_time() - cpu
+    extensions = sum(msg.extended_cnt for msg in msgs) - before
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"{name:<18} {memory / 1e6:>11.1f} {cpu:>8.2f} {extensions:>11}")
+
+
+async def main(messages):
+    global MESSAGES
+    MESSAGES = messages
+    print(f"{MESSAGES} messages, extended every {INTERVAL}s, for {DURATION}s")
+    print(f"{'mode':<18} {'memory (MB)':>11} {'cpu (s)':>8} {'extensions':>11}")
+    await measure("task per message", per_message_tasks)
+    await measure("lease manager", lease_manager)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES))
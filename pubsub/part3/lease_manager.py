@@ -0,0 +1,136 @@
+"""
+One lease manager for every in-flight message.
+
+`extend(msg, event)` gave each message its own task that woke every two
+seconds to push the ack deadline out: with 100k messages in flight that is
+100k tasks and 100k timers. `LeaseManager` is a hashed timer wheel instead:
+time is cut into `tick`-long slots and each lease sits in the bucket of the
+slot it is next due in. A single task sleeps until the earliest non-empty
+slot and extends that whole bucket in one pass, moving each lease to the
+bucket `interval` seconds later.
+
+When a message is done, `complete()` runs `on_done` (the ack) for it; the
+lease keeps being extended until that has finished, so the deadline cannot
+lapse while the ack is still waiting in a batch.
+"""
+
+import asyncio
+import heapq
+import logging
+
+
+class Lease:
+    __slots__ = ("msg", "active")
+
+    def __init__(self, msg):
+        self.msg = msg
+        self.active = True
+
+
+class LeaseManager:
+    """Extend the ack deadline of every in-flight message from one task.
+
+    Every lease is extended at the same `interval`, so a new lease never
+    falls due before the ones already waiting and the manager can simply
+    sleep until the earliest slot.
+
+    Args:
+        on_done (coroutine function): called with a message after
+            `complete()`, its lease is released once it returns.
+        interval (float): seconds between extensions of a lease.
+        extension (float): seconds each extension adds to the deadline.
+        tick (float): slot length in seconds; leases due in the same slot
+            are extended in the same pass, up to `tick` seconds early.
+    """
+
+    def __init__(self, on_done, interval=2, extension=3, tick=0.1):
+        self._on_done = on_done
+        self.interval = interval
+        self.extension = extension
+        self.tick = tick
+        self._leases = {}  # id(msg) -> Lease
+        # slot -> leases due in it; released leases are skipped when it fires
+        self._buckets = {}
+        self._slots = []  # heap of slots that have a bucket
+        self._wakeup = asyncio.Event()
+        self._finishing = set()
+        self.ticks = 0
+        self.extensions = 0
+
+    def _schedule(self, lease, due):
+        slot = int(due // self.tick)
+        bucket = self._buckets.get(slot)
+        if bucket is None:
+            bucket = self._buckets[slot] = []
+            heapq.heappush(self._slots, slot)
+        bucket.append(lease)
+
+    def add(self, msg):
+        """Take a lease on `msg`, extending its deadline right away."""
+        lease = self._leases[id(msg)] = Lease(msg)
+        msg.extended_cnt += 1
+        self._schedule(lease, asyncio.get_running_loop().time() + self.interval)
+        self._wakeup.set()
+
+    def _release(self, msg):
+        lease = self._leases.pop(id(msg), None)
+        if lease is not None:
+            lease.active = False
+
+    def drop(self, msg):
+        """Stop extending `msg` without acking it, the broker will redeliver."""
+        self._release(msg)
+
+    def complete(self, msg):
+        """`msg` is done: ack it through `on_done`, then release the lease."""
+        task = asyncio.create_task(self._finish(msg))
+        self._finishing.add(task)
+        task.add_done_callback(self._finishing.discard)
+
+    async def _finish(self, msg):
+        try:
+            await self._on_done(msg)
+        finally:
+            self._release(msg)
+
+    def _extend_slot(self, now):
+        bucket = self._buckets.pop(heapq.heappop(self._slots))
+        extended = [lease for lease in bucket if lease.active]
+        for lease in extended:
+            lease.msg.extended_cnt += 1
+        if extended:
+            # all due together, so they all move to the same later slot
+            slot = int((now + self.interval) // self.tick)
+            later = self._buckets.get(slot)
+            if later is None:
+                self._buckets[slot] = extended
+                heapq.heappush(self._slots, slot)
+            else:
+                later.extend(extended)
+        return len(extended)
+
+    async def run(self):
+        """Extend leases as they fall due, until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._slots:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._slots[0] * self.tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            extended = self._extend_slot(loop.time())
+            self.ticks += 1
+            self.extensions += extended
+            if extended:
+                logging.info(
+                    f"Extend deadline by {self.extension} seconds for {extended} messages"
+                )
+
+    def log_stats(self):
+        logging.info(
+            f"leases: {len(self._leases)} active, {self.extensions} extensions "
+            f"in {self.ticks} ticks"
+        )
@@ -0,0 +1,79 @@
+"""
+Creation speed and retained memory of the old and the compact PubSubMessage.
+
+    python message_benchmark.py [messages]
+
+"attrs dict" is the message class as it was: no slots, a stored hostname
+and a `str(uuid.uuid4())` id. "slotted" is `message.PubSubMessage` with an
+integer id from `new_message_id()`. Both get the same instance names. The
+table shows messages created per second, and the memory still held by the
+messages (including their ids and hostnames) while they are all kept in a
+list, as traced by tracemalloc.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+import uuid
+
+import attr
+
+from message import PubSubMessage, new_message_id
+
+MESSAGES = 1_000_000
+
+
+@attr.s
+class DictMessage:
+    instance_name = attr.ib()
+    message_id = attr.ib(repr=False)
+    hostname = attr.ib(repr=False, init=False)
+    restarted = attr.ib(repr=False, default=False)
+    saved = attr.ib(repr=False, default=False)
+    acked = attr.ib(repr=False, default=False)
+    extended_cnt = attr.ib(repr=False, default=0)
+    priority = attr.ib(repr=False, default=0)
+
+    def __attrs_post_init__(self):
+        self.hostname = f"{self.instance_name}.example.net"
+
+
+def dict_messages(names):
+    return [DictMessage(instance_name=name, message_id=str(uuid.uuid4())) for name in names]
+
+
+def slotted_messages(names):
+    return [PubSubMessage(instance_name=name, message_id=new_message_id()) for name in names]
+
+
+def measure(name, create, names):
+    gc.collect()
+    start = time.perf_counter()
+    msgs = create(names)
+    elapsed = time.perf_counter() - start
+    del msgs
+
+    gc.collect()
+    tracemalloc.start()
+    msgs = create(names)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del msgs
+
+    print(
+        f"{name:<12} {len(names) / elapsed:>12.0f} {retained / 1e6:>13.1f}"
+        f" {retained / len(names):>10.0f}"
+    )
+
+
+def main(messages):
+    names = [f"cattle-{i % 36**4:04x}" for i in range(messages)]
+    print(f"{messages} messages")
+    print(f"{'class':<12} {'created/s':>12} {'retained (MB)':>13} {'bytes/msg':>10}")
+    measure("attrs dict", dict_messages, names)
+    measure("slotted", slotted_messages, names)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES)
@@ -0,0 +1,86 @@
+"""
+One restart per host for a burst of messages naming it.
+
+Every message asking for a host restart used to restart it again, so a
+burst of ten messages for one host meant ten restarts back to back.
+`RestartCoalescer` sits in front of `restart_host` and keeps at most one
+restart per hostname: the first message opens a batch and waits `window`
+seconds for more to arrive, then the host is restarted once. Messages for
+the host arriving during the window, or while that restart is running, join
+the batch; all of them are marked `restarted` when it finishes.
+"""
+
+import asyncio
+import logging
+
+
+class RestartBatch:
+    def __init__(self):
+        self.msgs = []
+        self.started = False
+        self.task = None
+
+
+class RestartCoalescer:
+    """Keyed single-flight with debounce in front of a restart coroutine.
+
+    Args:
+        restart (coroutine function): restarts the host of the message it
+            is given.
+        window (float): seconds to wait after the first message for a host
+            before restarting it.
+    """
+
+    def __init__(self, restart, window=0.5):
+        self._restart = restart
+        self.window = window
+        self._batches = {}  # hostname -> RestartBatch
+        self.requests = 0
+        self.restarts = 0
+        self.merged_in_window = 0
+        self.merged_in_flight = 0
+
+    async def _run(self, hostname, batch):
+        try:
+            await asyncio.sleep(self.window)
+            batch.started = True
+            self.restarts += 1
+            await self._restart(batch.msgs[0])
+            for msg in batch.msgs:
+                msg.restarted = True
+        finally:
+            del self._batches[hostname]
+
+    @staticmethod
+    def _retrieve(task):
+        # every waiter may have been cancelled, don't warn about the error
+        if not task.cancelled():
+            task.exception()
+
+    async def restart(self, msg):
+        """Restart `msg.hostname`, sharing the restart with other messages."""
+        self.requests += 1
+        batch = self._batches.get(msg.hostname)
+        if batch is None:
+            batch = self._batches[msg.hostname] = RestartBatch()
+            batch.task = asyncio.create_task(self._run(msg.hostname, batch))
+            batch.task.add_done_callback(self._retrieve)
+        elif batch.started:
+            self.merged_in_flight += 1
+        else:
+            self.merged_in_window += 1
+        batch.msgs.append(msg)
+        # shielded, so one cancelled waiter doesn't cancel the others' restart
+        await asyncio.shield(batch.task)
+
+    @property
+    def coalescing_ratio(self):
+        """Restart requests per actual restart."""
+        return self.requests / self.restarts if self.restarts else 0.0
+
+    def log_stats(self):
+        logging.info(
+            f"restarts: {self.restarts} for {self.requests} requests "
+            f"(ratio {self.coalescing_ratio:.2f}, {self.merged_in_window} merged "
+            f"in window, {self.merged_in_flight} while restarting)"
+        )
@@ -0,0 +1,150 @@
+"""
+Write-behind message store on a local SQLite database.
+
+Writing and committing every message on its own means one transaction, and
+one fsync, per message. `WriteBehindStore` buffers saved messages and writes
+them with a single `executemany` in one transaction per batch (batching is
+shared with the ack batcher, see batch_flusher.py).
+
+By default a batch is written as soon as the previous one is committed.
+Every caller of `save()` waits for its commit, so when no write is running
+all of them are already buffered; with N handlers saving inline a batch can
+never grow past N rows, and holding it open for `flush_interval` only adds
+latency. Rows arriving during a write go out together in the next batch, so
+batches grow with the load.
+
+`save()` only returns once the transaction holding the message has been
+committed, so a message that is acked after `save()` is always on disk
+first. Acks never overtake the write. The buffer holds at most `max_buffer`
+rows; when it is full `save()` waits for room. A failed write is logged and
+its rows are retried with the next batch.
+
+Rows are keyed by message id. A redelivered message (same id and instance)
+overwrites its earlier row. Ids are not globally unique (see message.py), so
+a different message whose id is already taken is never written over the
+other one: its `save()` raises `DuplicateMessageId`.
+
+SQLite calls block, so they run in a worker thread.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+
+from batch_flusher import BatchFlusher
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    instance_name TEXT NOT NULL,
+    hostname TEXT NOT NULL,
+    saved_at REAL NOT NULL
+)
+"""
+INSERT = "INSERT INTO messages VALUES (?, ?, ?, ?)"
+# only reached for a redelivery, other conflicts are rejected before writing
+UPSERT = INSERT + """
+ON CONFLICT (message_id) DO UPDATE SET
+    hostname = excluded.hostname, saved_at = excluded.saved_at
+"""
+SELECT_INSTANCES = (
+    "SELECT message_id, instance_name FROM messages WHERE message_id IN ({})"
+)
+
+
+class DuplicateMessageId(Exception):
+    """A different message with the same id is already stored."""
+
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    # WAL keeps a commit to a single fsync; synchronous stays FULL for durability
+    db.execute("PRAGMA journal_mode=WAL")
+    with db:
+        db.execute(SCHEMA)
+    return db
+
+
+def message_row(msg):
+    return (msg.message_id, msg.instance_name, msg.hostname, time.time())
+
+
+class WriteBehindStore(BatchFlusher):
+    """Buffer messages and commit them to SQLite in batches.
+
+    Args:
+        path (str): SQLite database file.
+        max_buffer (int): most rows buffered or being written at once.
+        batch_size (int): most rows written in one transaction.
+        flush_interval (float): seconds the oldest buffered row may wait for
+            a fuller batch, or None to write once the previous batch is done.
+    """
+
+    action = "Saving"
+    noun = "messages"
+
+    def __init__(self, path, max_buffer=1000, batch_size=200, flush_interval=None):
+        super().__init__(batch_size, flush_interval)
+        self._db = connect(path)
+        self._room = asyncio.Semaphore(max_buffer)
+        self._closed = False
+        self.write_time = 0.0
+
+    async def save(self, msg):
+        """Buffer `msg` and wait until it has been committed."""
+        if self._closed:
+            raise RuntimeError("store is closed")
+        # released by _write() once the row is committed or rejected
+        await self._room.acquire()
+        await self.submit(message_row(msg))
+
+    def _commit(self, rows):
+        accepted = []
+        rejected = {}
+        with self._db:
+            # take the write lock first, another process may share the file
+            self._db.execute("BEGIN IMMEDIATE")
+            instances = dict(
+                self._db.execute(
+                    SELECT_INSTANCES.format(",".join("?" * len(rows))),
+                    [row[0] for row in rows],
+                )
+            )
+            for i, row in enumerate(rows):
+                message_id, instance_name = row[0], row[1]
+                if instances.setdefault(message_id, instance_name) != instance_name:
+                    rejected[i] = DuplicateMessageId(
+                        f"message id {message_id} is taken by {instances[message_id]}"
+                    )
+                else:
+                    accepted.append(row)
+            self._db.executemany(UPSERT, accepted)
+        return rejected
+
+    async def _write(self, rows):
+        start = time.monotonic()
+        rejected = await asyncio.to_thread(self._commit, rows)
+        self.write_time += time.monotonic() - start
+        for _ in rows:
+            self._room.release()
+        if rejected:
+            logging.error(f"Rejected {len(rejected)} messages with duplicate ids")
+        return rejected
+
+    async def close(self):
+        """Commit everything still buffered and close the database."""
+        self._closed = True
+        await super().close()
+        async with self._flushing:
+            self._db.close()
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"store: {stats['written']} rows in {stats['batches']} batches "
+            f"(mean {stats['mean_batch']}, max {stats['max_batch']}), "
+            f"{self.write_time:.2f}s writing, p99 {stats['p99_ms']}ms to commit, "
+            f"{stats['pending']} buffered, {stats['failed_flushes']} failed flushes, "
+            f"{stats['rejected']} duplicate ids rejected"
+        )
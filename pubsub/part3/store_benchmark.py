@@ -0,0 +1,102 @@
+"""
+SQLite throughput: one committed insert per message vs write-behind batches.
+
+    python store_benchmark.py [messages] [savers]
+
+Every mode writes the same messages into a fresh database in a temporary
+directory. "per message" commits each insert in its own transaction, as a
+database call per `save()` would. The write-behind modes run the store the
+way the pipeline does: `savers` handlers (the pipeline's MAX_IN_FLIGHT) each
+await `save()` for one message before taking the next, so at most `savers`
+rows are ever buffered. "write-behind" writes a batch as soon as the
+previous one is done, "held open" waits up to 0.5s for a batch of 200 that
+can never fill.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from message import PubSubMessage, new_message_id
+from store import INSERT, WriteBehindStore, connect, message_row
+
+MESSAGES = 2_000
+SAVERS = 50
+
+
+def count_rows(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    finally:
+        db.close()
+
+
+async def per_message(path, msgs):
+    db = connect(path)
+
+    def insert(row):
+        with db:
+            db.execute(INSERT, row)
+
+    try:
+        for msg in msgs:
+            await asyncio.to_thread(insert, message_row(msg))
+    finally:
+        db.close()
+
+
+async def write_behind(path, msgs, savers, batch_size, flush_interval):
+    store = WriteBehindStore(path, savers, batch_size, flush_interval)
+    runner = asyncio.create_task(store.run())
+    it = iter(msgs)
+
+    async def saver():
+        for msg in it:
+            await store.save(msg)
+
+    try:
+        await asyncio.gather(*(saver() for _ in range(savers)))
+    finally:
+        runner.cancel()
+        await store.close()
+    return store
+
+
+async def main(messages, savers):
+    msgs = [
+        PubSubMessage(instance_name=f"cattle-{i:04x}", message_id=new_message_id())
+        for i in range(messages)
+    ]
+    modes = (
+        ("per message", lambda path: per_message(path, msgs)),
+        ("write-behind", lambda path: write_behind(path, msgs, savers, savers, None)),
+        ("held open", lambda path: write_behind(path, msgs, savers, 200, 0.5)),
+    )
+    print(f"{messages} messages, {savers} savers")
+    print(f"{'mode':<14} {'seconds':>8} {'msgs/s':>9} {'rows':>7} {'mean batch':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run in modes:
+            path = os.path.join(directory, f"{name.replace(' ', '_')}.db")
+            start = time.perf_counter()
+            store = await run(path)
+            elapsed = time.perf_counter() - start
+            mean = store.stats()["mean_batch"] if store else 1
+            print(
+                f"{name:<14} {elapsed:>8.2f} {messages / elapsed:>9.0f} "
+                f"{count_rows(path):>7} {mean:>11}"
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES,
+            int(sys.argv[2]) if len(sys.argv) > 2 else SAVERS,
+        )
+    )
@@ -0,0 +1,121 @@
+"""
+Fixed-size pool of consumer workers.
+
+Starting a `handle_message` task for every dequeued message means a burst of
+100k messages turns into 100k concurrent saves, restarts and extend loops.
+Instead `workers` long-lived workers take turns pulling from the queue, and
+a worker only pulls a message once one of the `max_in_flight` slots is
+free. A worker doesn't wait for its handler before pulling the next message,
+so with `max_in_flight` above `workers` each worker runs several handlers at
+once; handlers mostly wait on I/O. Messages that cannot be handled right
+away stay in the (bounded) queue, where the publisher's overload policy
+applies to them.
+
+Each worker tracks how many messages it handled and how much of its time it
+had at least one handler running, so the pool can be tuned from the
+utilization numbers: workers that are all near 100% mean the pool is too
+small, mostly idle workers mean it is bigger than it needs to be.
+"""
+
+import asyncio
+import logging
+import time
+
+
+class Worker:
+    def __init__(self, name):
+        self.name = name
+        self.handled = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.active = 0
+        self.busy_since = None
+
+    def busy(self, now):
+        """Time spent with at least one handler running, up to `now`."""
+        if self.active:
+            return self.busy_time + now - self.busy_since
+        return self.busy_time
+
+
+class WorkerPool:
+    """Handle messages from `queue` with a fixed number of workers.
+
+    Args:
+        queue (asyncio.Queue): queue to consume messages from.
+        handler (coroutine function): called with each message.
+        workers (int): number of worker tasks.
+        max_in_flight (int): most messages being handled at once across
+            all workers; defaults to `workers`, i.e. one per worker.
+    """
+
+    def __init__(self, queue, handler, workers=10, max_in_flight=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.queue = queue
+        self.handler = handler
+        self.max_in_flight = max_in_flight or workers
+        self.workers = [Worker(f"worker-{i}") for i in range(workers)]
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._started_at = None
+
+    async def _work(self, worker):
+        handling = set()
+        try:
+            while True:
+                await self._slots.acquire()
+                try:
+                    msg = await self.queue.get()
+                except BaseException:
+                    self._slots.release()
+                    raise
+                task = asyncio.create_task(self._handle(worker, msg))
+                handling.add(task)
+                task.add_done_callback(handling.discard)
+        finally:
+            for task in handling:
+                task.cancel()
+            if handling:
+                await asyncio.wait(handling)
+
+    async def _handle(self, worker, msg):
+        if not worker.active:
+            worker.busy_since = time.monotonic()
+        worker.active += 1
+        try:
+            await self.handler(msg)
+            worker.handled += 1
+        except Exception as e:
+            # one bad message must not take the worker down with it
+            worker.failed += 1
+            logging.error(f"{worker.name} failed to handle {msg}: {e!r}")
+        finally:
+            worker.active -= 1
+            if not worker.active:
+                worker.busy_time += time.monotonic() - worker.busy_since
+            self._slots.release()
+            self.queue.task_done()
+
+    async def run(self):
+        """Run the workers until cancelled."""
+        self._started_at = time.monotonic()
+        await asyncio.gather(*(self._work(worker) for worker in self.workers))
+
+    def utilization(self):
+        """Fraction of the time since `run()` each worker spent handling."""
+        if self._started_at is None:
+            return {worker.name: 0.0 for worker in self.workers}
+        now = time.monotonic()
+        elapsed = now - self._started_at
+        return {
+            worker.name: worker.busy(now) / elapsed if elapsed else 0.0
+            for worker in self.workers
+        }
+
+    def log_utilization(self):
+        utilization = self.utilization()
+        for worker in self.workers:
+            logging.info(
+                f"{worker.name}: handled {worker.handled}, failed {worker.failed}, "
+                f"busy {utilization[worker.name]:.0%}"
+            )
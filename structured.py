@@ -0,0 +1,151 @@
+"""
+Structured gather: run awaitables together and never leave one behind.
+
+`asyncio.gather` raises the first exception but leaves the other children
+running (see 3_exception_handling_basics/exception_tasks.py, where func_a
+keeps sleeping after func_c failed). `structured_gather` instead cancels the
+siblings on the first failure and waits for every one of them to actually
+finish before raising, or, with `collect_errors=True`, runs everything and
+returns the exceptions in place of results like `return_exceptions=True`.
+
+It lives at the repo root and is shared by the lessons; scripts that use it
+put the root on `sys.path`.
+
+Pass a `GatherReport` to get start, end, outcome and cancel latency for every
+child, i.e. how much work a failure threw away and how long the cancellation
+took to settle.
+"""
+
+import asyncio
+import time
+from collections import namedtuple
+
+ChildReport = namedtuple(
+    "ChildReport", ("name", "started", "ended", "outcome", "error", "cancel_latency")
+)
+
+
+class GatherReport:
+    """Per-child timings of one `structured_gather` call, relative to its start."""
+
+    def __init__(self) -> None:
+        self.children: list[ChildReport] = []
+
+    @property
+    def wasted(self) -> float:
+        """Seconds of work done by children that were cancelled part way."""
+        return sum(
+            c.ended - c.started
+            for c in self.children
+            if c.outcome == "cancelled" and c.started is not None
+        )
+
+    def log(self, emit=print) -> None:
+        outcomes = [c.outcome for c in self.children]
+        emit(
+            "Gathered {} children: {} ok, {} failed, {} cancelled, "
+            "{:.2f}s of work thrown away".format(
+                len(self.children),
+                outcomes.count("ok"),
+                outcomes.count("error"),
+                outcomes.count("cancelled"),
+                self.wasted,
+            )
+        )
+        for c in self.children:
+            started = "never started" if c.started is None else f"{c.started:.3f}s"
+            line = f"  {c.name}: {c.outcome}, start {started}, end {c.ended:.3f}s"
+            if c.error is not None:
+                line += f", {c.error!r}"
+            if c.cancel_latency is not None:
+                line += f", settled {c.cancel_latency * 1000:.1f} ms after cancel"
+            emit(line)
+
+
+async def structured_gather(*aws, collect_errors=False, report=None):
+    """Run `aws` concurrently and return their results in order.
+
+    Args:
+        *aws: coroutines or other awaitables.
+        collect_errors (bool): run every child to completion and return
+            exceptions as results instead of failing fast.
+        report (GatherReport): filled in with per-child timings, also when
+            an exception is raised.
+
+    Raises:
+        The first child exception (fail-fast mode), after every sibling has
+        been cancelled and has finished. If the gather itself is cancelled,
+        all children are cancelled and awaited first.
+    """
+    origin = time.monotonic()
+    started = {}
+    cancelled_at = {}
+
+    async def run(index, aw):
+        started[index] = time.monotonic() - origin
+        return await aw
+
+    tasks = [asyncio.ensure_future(run(i, aw)) for i, aw in enumerate(aws)]
+    ended = {}
+    for i, task in enumerate(tasks):
+        task.add_done_callback(
+            lambda _, i=i: ended.setdefault(i, time.monotonic() - origin)
+        )
+
+    def cancel_pending():
+        for i, task in enumerate(tasks):
+            if not task.done():
+                cancelled_at[i] = time.monotonic() - origin
+                task.cancel()
+
+    try:
+        if tasks:
+            return_when = (
+                asyncio.ALL_COMPLETED if collect_errors else asyncio.FIRST_EXCEPTION
+            )
+            done, pending = await asyncio.wait(tasks, return_when=return_when)
+            if pending:
+                cancel_pending()
+                await asyncio.wait(pending)
+    except asyncio.CancelledError:
+        cancel_pending()
+        await asyncio.wait(tasks)
+        raise
+    finally:
+        if report is not None:
+            now = time.monotonic() - origin
+            for i in range(len(tasks)):
+                ended.setdefault(i, now)
+            _fill_report(report, aws, tasks, started, ended, cancelled_at)
+
+    results = []
+    first_error = None
+    for i, task in enumerate(tasks):
+        if task.cancelled():
+            error = asyncio.CancelledError()
+        else:
+            error = task.exception()
+        if error is not None and i not in cancelled_at and first_error is None:
+            first_error = error
+        results.append(error if error is not None else task.result())
+
+    if first_error is not None and not collect_errors:
+        raise first_error
+    return results
+
+
+def _fill_report(report, aws, tasks, started, ended, cancelled_at):
+    for i, (aw, task) in enumerate(zip(aws, tasks)):
+        if not task.done():
+            continue
+        if task.cancelled():
+            outcome, error = "cancelled", None
+        elif task.exception() is not None:
+            outcome, error = "error", task.exception()
+        else:
+            outcome, error = "ok", None
+        latency = ended[i] - cancelled_at[i] if i in cancelled_at else None
+        name = getattr(aw, "__qualname__", None) or task.get_name()
+        report.children.append(
+            ChildReport(name, started.get(i), ended[i], outcome, error, latency)
+        )